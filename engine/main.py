@@ -1,11 +1,14 @@
 import os
 import sys
-import json
 import time
 import importlib
 import threading
 import signal
+import numpy as np
+import orjson
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 from src.utils.logger import Logger
 from src.database.database import Database
@@ -16,21 +19,126 @@ from src.database.schemas.camera_config_schema import CameraConfig
 
 shutdown_event = threading.Event()
 
+# MongoDB pool settings, applied to the URI unless it already sets them
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": "20",
+    "minPoolSize": "5",
+    "maxIdleTimeMS": "60000",
+    "maxConnecting": "2",
+}
+
+def _with_pool_options(uri):
+    parts = urlsplit(uri)
+    query = dict(parse_qsl(parts.query))
+    for key, value in MONGO_POOL_OPTIONS.items():
+        query.setdefault(key, value)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+# (module_path, class_name) -> class, shared by every engine in this process
+_CLASS_CACHE = {}
+
+def _resolve_class(mod_path, cls_name):
+    key = (mod_path, cls_name)
+    class_ref = _CLASS_CACHE.get(key)
+    if class_ref is None:
+        class_ref = getattr(importlib.import_module(mod_path), cls_name)
+        _CLASS_CACHE[key] = class_ref
+    return class_ref
+
 def signal_handler(sig, frame):
     print("🛑 Shutdown signal received!")
     shutdown_event.set()
 
+@dataclass(slots=True)
+class FramePayload:
+    """
+    The data packet for a single frame.
+    The frame is shared, not cloned: it is the camera's ring slot and read-only.
+    Modules that draw take writable_frame() (a private copy, made once);
+    get_original() gives an untouched copy for anything that must outlive the
+    payload. The engine hands the slot back with release() after the pipeline,
+    so modules must not keep payload.frame itself past their step.
+    Capture time is kept as plain numbers; the tz-aware datetime is only built
+    if a module (e.g. a DB writer) asks for datetime_utc.
+    """
+    frame: object
+    timestamp_ns: int # time.monotonic_ns(), for intervals/ordering
+    capture_epoch: float # time.time() at capture
+    frame_number: int
+    meta: dict = field(default_factory=dict) # Store results here
+    _original: object = field(default=None, repr=False)
+    _datetime_utc: datetime = field(default=None, repr=False)
+    _release: object = field(default=None, repr=False) # Returns the frame's slot to the camera
+
+    def writable_frame(self):
+        """Returns a frame modules can draw on, copying the read-only camera frame on first call."""
+        if not self.frame.flags.writeable:
+            self.frame = self.frame.copy()
+        return self.frame
+
+    def release(self):
+        """Hands the camera's frame slot back; called by the engine once the pipeline is done."""
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+    def get_original(self):
+        """Returns an untouched copy of the frame, made lazily on first access."""
+        if self._original is None:
+            self._original = self.frame.copy()
+        return self._original
+
+    @property
+    def original(self):
+        return self.get_original()
+
+    @property
+    def datetime_utc(self):
+        """Wall-clock capture time as a UTC datetime, built on first access."""
+        if self._datetime_utc is None:
+            self._datetime_utc = datetime.fromtimestamp(self.capture_epoch, tz=timezone.utc)
+        return self._datetime_utc
+
+@dataclass(slots=True)
+class BatchPayload:
+    """The data packet for a micro-batch of N frames (see DynamicEngine.batch_size)."""
+    frames: np.ndarray # (N, H, W, C)
+    timestamps_ns: list
+    capture_epochs: list
+    frame_numbers: list
+    metas: list
+    dropped: set = field(default_factory=set) # Indices aborted by a per-frame module
+
 class DynamicEngine:
+    # One Database (and so one MongoClient pool) per process, shared by every engine
+    _db = None
+    _db_uri = None
+
     def __init__(self, camera_id, service_id, mongodb_uri):
         self.logger = Logger(category="DynamicEngine").get_logger()
-        self.db = Database()
-        self.db.connect_db(mongodb_uri)
+        self.db = self._shared_db(mongodb_uri)
         
         self.camera_id = camera_id
         self.service_id = service_id
         self.pipeline_modules = [] # List of instantiated objects
+        self._pipeline_fn = None # Fused callable built from pipeline_modules
         self.camera = None
 
+        # Micro-batching (pipeline JSON "batch_size"). 1 = frame-at-a-time.
+        self.batch_size = 1
+        self._batch_buf = None # Preallocated (N, H, W, C) frames
+        self._batch = None
+
+    @classmethod
+    def _shared_db(cls, mongodb_uri):
+        """Connects once per process; later engines with the same URI reuse the warm pool."""
+        uri = _with_pool_options(mongodb_uri)
+        if cls._db is None or cls._db_uri != uri:
+            cls._db = Database()
+            cls._db.connect_db(uri)
+            cls._db_uri = uri
+        return cls._db
+
     def load_configuration(self):
         """
         Fetches config from DB and loads the JSON pipeline definition.
@@ -41,8 +149,8 @@ class DynamicEngine:
         
         # 2. Load the JSON Pipeline Config
         try:
-            with open(self.svc_doc.pipelinePath, 'r') as f:
-                self.json_config = json.load(f)
+            with open(self.svc_doc.pipelinePath, 'rb') as f:
+                self.json_config = orjson.loads(f.read())
         except Exception as e:
             self.logger.error(f"Failed to load JSON config: {e}")
             sys.exit(1)
@@ -63,11 +171,16 @@ class DynamicEngine:
             self.logger.error("Could not connect to camera.")
             sys.exit(1)
 
+        # The reader thread owns the VideoCapture from here on (it is not thread-safe)
+        self.camera.start_reader_loop()
+        self.camera.start_health_monitor()
+
     def build_pipeline(self):
         """
         Dynamically imports and instantiates classes defined in the JSON.
         """
         modules_list = self.json_config.get("modules", [])
+        self.batch_size = max(1, int(self.json_config.get("batch_size", 1)))
         
         for step in modules_list:
             name = step["name"]
@@ -78,9 +191,8 @@ class DynamicEngine:
             self.logger.info(f"🔌 Loading module: {name} ({cls_name})")
             
             try:
-                # DYNAMIC IMPORT MAGIC
-                module_ref = importlib.import_module(mod_path)
-                class_ref = getattr(module_ref, cls_name)
+                # DYNAMIC IMPORT MAGIC (memoized)
+                class_ref = _resolve_class(mod_path, cls_name)
                 
                 # Instantiate. We pass the config + a reference to the engine/camera if needed
                 # Note: We merge the JSON config with runtime data
@@ -96,39 +208,132 @@ class DynamicEngine:
                 self.logger.error(f"❌ Failed to load module {name}: {e}")
                 sys.exit(1)
 
+        if self.batch_size > 1:
+            # Batch-aware modules (e.g. DNNs) see all N frames at once; the rest are looped
+            steps = [
+                mod.process if getattr(mod, "supports_batch", False) else self._per_frame(mod.process)
+                for mod in self.pipeline_modules
+            ]
+            self.logger.info(f"📦 Micro-batching {self.batch_size} frames per pipeline call.")
+        else:
+            steps = [mod.process for mod in self.pipeline_modules]
+        self._pipeline_fn = self._fuse_pipeline(steps)
+
+    @staticmethod
+    def _fuse_pipeline(processes):
+        """
+        Generates one straight-line function that calls every module's process()
+        in order, so the per-frame hot loop has no list iteration or attribute lookups.
+        Every module MUST return the payload (modified or not); None aborts the frame.
+        """
+        steps = {f"m{i}": process for i, process in enumerate(processes)}
+        args = "".join(f", {name}={name}" for name in steps)
+        lines = [f"def run_once(p{args}):"]
+        for name in steps:
+            lines.append(f"    p = {name}(p)")
+            lines.append("    if p is None: return None")
+        lines.append("    return p")
+
+        namespace = dict(steps)
+        exec("\n".join(lines), namespace)
+        return namespace["run_once"]
+
+    @staticmethod
+    def _per_frame(process):
+        """
+        Adapts a single-frame module to batch payloads by calling it once per frame.
+        A None result drops that frame for the remaining stages; the batch is
+        aborted only when every frame has been dropped.
+        """
+        def run(batch):
+            frames, dropped = batch.frames, batch.dropped
+            for i, (ts_ns, epoch, num, meta) in enumerate(
+                zip(batch.timestamps_ns, batch.capture_epochs, batch.frame_numbers, batch.metas)
+            ):
+                if i in dropped:
+                    continue
+                single = FramePayload(
+                    frame=frames[i], timestamp_ns=ts_ns, capture_epoch=epoch, frame_number=num, meta=meta
+                )
+                if process(single) is None:
+                    dropped.add(i)
+            return None if len(dropped) == len(frames) else batch
+        return run
+
+    def _collect(self, payload):
+        """
+        Copies the frame into the preallocated batch buffer.
+        Returns the batch payload once N frames are collected, else None.
+        Batch frames stay valid until the next batch starts filling.
+        """
+        frame = payload.frame
+        if self._batch_buf is None or self._batch_buf.shape[1:] != frame.shape:
+            self._batch_buf = np.empty((self.batch_size,) + frame.shape, frame.dtype)
+            self._batch = None
+        if self._batch is None:
+            self._batch = {"timestamps_ns": [], "capture_epochs": [], "frame_numbers": [], "metas": []}
+
+        batch = self._batch
+        i = len(batch["frame_numbers"])
+        self._batch_buf[i] = frame
+        batch["timestamps_ns"].append(payload.timestamp_ns)
+        batch["capture_epochs"].append(payload.capture_epoch)
+        batch["frame_numbers"].append(payload.frame_number)
+        batch["metas"].append(payload.meta)
+        if i + 1 < self.batch_size:
+            return None
+
+        self._batch = None
+        return BatchPayload(frames=self._batch_buf, **batch)
+
     def run(self):
         """
         The Main Loop: Captures frame -> Passes through all modules -> Repeats
         """
         self.logger.info("🚀 Pipeline Started.")
         frame_count = 0
+        last_frame_id = None
         
         try:
-            while not shutdown_event.is_set() and self.camera.is_open:
-                # 1. Capture
-                ret, frame = self.camera.capture.read()
+            # The reader thread reconnects on its own, so a closed camera is not a reason to stop
+            while not shutdown_event.is_set():
+                # 1. Capture (newest frame from the reader thread)
+                ret, frame = self.camera.read()
                 if not ret:
                     self.logger.warning("Empty frame.")
                     time.sleep(0.1)
                     continue
+
+                frame_id = self.camera.frame_id
+                if frame_id == last_frame_id:
+                    self.camera.release(frame)
+                    time.sleep(0.005) # Pipeline is ahead of the camera; wait for a new frame
+                    continue
+                last_frame_id = frame_id
                 
                 # 2. Create the Payload (The data packet for this frame)
-                payload = {
-                    "frame": frame,
-                    "original_frame": frame.copy(),
-                    "timestamp": datetime.now(timezone.utc),
-                    "frame_number": frame_count,
-                    "meta": {} # Store results here
-                }
-
-                # 3. Execute Pipeline Steps
-                for module in self.pipeline_modules:
-                    # Every module MUST return the payload (modified or not)
-                    payload = module.process(payload)
-                    
-                    # If a module returns None, it means "abort this frame"
-                    if payload is None:
-                        break
+                # No eager copy here; modules opt in via payload.get_original()
+                payload = FramePayload(
+                    frame=frame,
+                    timestamp_ns=time.monotonic_ns(),
+                    capture_epoch=time.time(),
+                    frame_number=frame_count,
+                    meta={},
+                    _release=lambda frame=frame: self.camera.release(frame)
+                )
+
+                # 3. Execute Pipeline Steps (a None result means "abort this frame")
+                if self.batch_size > 1:
+                    batch = self._collect(payload)
+                    # Copied into the batch buffer, the camera can have the slot back
+                    payload.release()
+                    if batch is not None:
+                        self._pipeline_fn(batch)
+                else:
+                    try:
+                        self._pipeline_fn(payload)
+                    finally:
+                        payload.release()
 
                 frame_count += 1
 
@@ -140,7 +345,7 @@ class DynamicEngine:
     def cleanup(self):
         self.logger.info("Cleaning up...")
         if self.camera:
-            self.camera.disconnect()
+            self.camera.close()
         # Allow modules to cleanup too
         for mod in self.pipeline_modules:
             if hasattr(mod, 'close'):
@@ -2,16 +2,74 @@
 import os
 import time
 import threading
-import signal
 import subprocess
 import datetime as dt
 import numpy as np
 import cv2
+from functools import lru_cache
 
 # Custom Imports
 from src.monitoring_stack.mongodb_logger import initialize_logger
 from src.utils.health import FrameHealthValidator  # Your new util module
 
+# Codec per stream URI, so reconnects don't re-run ffprobe (up to 5s each)
+_CODEC_CACHE: dict[str, str] = {}
+
+
+@lru_cache(maxsize=None)
+def _gst_has_element(element: str) -> bool:
+    """Checks (once per process) whether a GStreamer element is installed."""
+    try:
+        result = subprocess.run(["gst-inspect-1.0", "--exists", element], capture_output=True, timeout=5)
+        return result.returncode == 0
+    except Exception:
+        return False
+
+
+# Upper bound on pooled decode buffers; past it frames are decoded into fresh arrays
+_RING_MAX = 16
+
+
+def _alloc_mapped(shape, dtype):
+    """
+    Allocates a numpy array in page-locked, device-mapped host memory (cudaHostAllocMapped).
+    On integrated-GPU SoCs (Jetson) CUDA kernels read it directly, no host->device copy.
+    Returns (array, device_ptr).
+    """
+    import cupy as cp  # Optional dependency, only needed for zero_copy
+
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    mem = cp.cuda.PinnedMemory(nbytes, cp.cuda.runtime.hostAllocMapped)
+    host = np.ndarray(shape, dtype, buffer=cp.cuda.PinnedMemoryPointer(mem, 0))
+    dev_ptr = cp.cuda.runtime.hostGetDevicePointer(mem.ptr, 0)
+    return host, dev_ptr
+
+
+class FrameView(np.ndarray):
+    """
+    A frame that also advertises its CUDA-mapped memory.
+    It is still a plain numpy array for OpenCV, but when the camera decodes into
+    mapped memory it exposes __cuda_array_interface__, so torch.as_tensor(frame)
+    or cp.asarray(frame) build a device view without copying.
+    """
+
+    def __array_finalize__(self, obj):
+        # Slices/derived arrays don't start at the mapped pointer; drop it
+        self.device_ptr = None
+
+    @property
+    def __cuda_array_interface__(self):
+        if self.device_ptr is None:
+            raise AttributeError("Frame is not in CUDA-mapped memory")
+        return {
+            "shape": self.shape,
+            "strides": None if self.flags.c_contiguous else self.strides,
+            "typestr": self.dtype.str,
+            "data": (self.device_ptr, False),
+            "version": 3,
+        }
+
+
 class IP_Camera:
     """
     Production-grade IP Camera interface.
@@ -30,7 +88,10 @@ class IP_Camera:
         logger=None,
         zones=None,
         process_skip_frame: int = 0,
-        reconnect_interval: int = 5
+        reconnect_interval: int = 5,
+        hwaccel: str = "auto",
+        pixel_format: str = "BGR",
+        zero_copy: bool = False
     ):
         self.ip_address = ip_address
         self.device_name = device_name
@@ -38,6 +99,11 @@ class IP_Camera:
         self.zones = zones if zones is not None else []
         self.process_skip_frames = max(0, process_skip_frame)
         self.reconnect_interval = reconnect_interval
+        self.hwaccel = hwaccel # "auto" | "nvidia" | "vaapi" | "v4l2" | "cpu"
+        # "NV12" keeps the decoder's native 12bpp layout; use as_bgr() where BGR is needed
+        self.pixel_format = pixel_format.upper()
+        
+        self.zero_copy = zero_copy # Decode into CUDA-mapped host memory (Jetson)
         
         # Logging
         self.logger = logger if logger else initialize_logger(category=f"Cam-{device_name}")
@@ -49,13 +115,29 @@ class IP_Camera:
         self.fps = 0.0
         self.frame_width = 0
         self.frame_height = 0
+        self.frame_format = "BGR" # Actual layout delivered by the current capture
+        self._rotated_in_pipeline = False # True when GStreamer already applies self.rotation
         
         # Threading & Buffers
-        self._lock = threading.Lock()
-        self._last_frame = None
+        # Double buffer: the reader writes the inactive slot then flips _active.
+        self._slots = [None, None]
+        self._active = 0
         self._last_frame_time = 0.0
+        self.frame_id = 0 # Increments on every published frame, lets consumers skip repeats
+        # Decode targets reused across frames (no per-frame allocation)
+        self._ring = []
+        self._ring_idx = 0
+        self._ring_dev_ptrs = {} # host ptr -> device ptr, only with zero_copy
+        self._ring_leases = {} # host ptr -> frames handed out by read() and not yet released
+        self._ring_lock = threading.Lock() # Guards the leases and the publish of a new frame
         
         # Reader Thread
+        self._grab_idx = 0
+        # appsink (sync=false, max-buffers=1) blocks grab() until the next frame, so
+        # the reader needs no sleep. Verified on the first grabs after each connect.
+        self.blocking_read = True
+        self._probe_grabs = 0
+        self._fast_grabs = 0
         self.reader_thread = None
         self.reader_stop_event = threading.Event()
         
@@ -66,13 +148,7 @@ class IP_Camera:
         self.is_connected = False
         self.is_corrupted = False
         self.health_issues = []
-
-        # Signal Handling
-        try:
-            signal.signal(signal.SIGINT, self._signal_handler)
-            signal.signal(signal.SIGTERM, self._signal_handler)
-        except ValueError:
-            pass # Handles case where signal is not in main thread
+        # Shutdown is driven by the owner (engine) calling close(); no signal handlers here
 
     # =========================================================================
     # Connection Logic
@@ -94,6 +170,8 @@ class IP_Camera:
                 self.is_open = True
                 self._update_frame_buffer(frame)
                 self._extract_metadata(frame)
+                self._alloc_ring(frame)
+                self.blocking_read, self._probe_grabs, self._fast_grabs = True, 5, 0
                 self.logger.info(f"✅ Connected to {self.device_name} | FPS: {self.fps:.2f} | {self.frame_width}x{self.frame_height}")
                 return True
         
@@ -103,6 +181,8 @@ class IP_Camera:
     def _connect_file(self):
         self.logger.info(f"Opening video file: {self.ip_address}")
         self.capture = cv2.VideoCapture(self.ip_address)
+        self.frame_format = "BGR"
+        self._rotated_in_pipeline = False
 
     def _connect_stream(self, preferred_codec):
         # 1. Auto-detect codec if requested
@@ -121,8 +201,19 @@ class IP_Camera:
             pipeline = self._gst_pipeline(self.ip_address, codec=alt_codec)
             self.capture = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
 
-        # 4. Fallback: FFmpeg (Best for Compatibility)
+        # 4. Fallback: Software decode with GStreamer (hardware decoder may be busy/broken)
+        if not self.capture.isOpened() and self._resolve_hwaccel(preferred_codec) != "cpu":
+            self.logger.warning("GStreamer hardware decode failed. Trying software decode...")
+            pipeline = self._gst_pipeline(self.ip_address, codec=preferred_codec, hwaccel="cpu")
+            self.capture = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+
+        self.frame_format = self.pixel_format
+        self._rotated_in_pipeline = self.rotation != 0
+
+        # 5. Fallback: FFmpeg (Best for Compatibility)
         if not self.capture.isOpened():
+            self.frame_format = "BGR"
+            self._rotated_in_pipeline = False
             self.logger.warning("GStreamer failed. Falling back to FFmpeg.")
             self.capture = cv2.VideoCapture(self.ip_address, cv2.CAP_FFMPEG)
             # Set buffer size small to reduce latency in FFmpeg
@@ -134,8 +225,9 @@ class IP_Camera:
         if self.capture:
             self.capture.release()
         
-        # Simple backoff
-        time.sleep(self.reconnect_interval)
+        # Simple backoff (returns early if close() is called meanwhile)
+        if self.reader_stop_event.wait(self.reconnect_interval):
+            return
         
         try:
             self.connect(rtsp_codec="auto")
@@ -146,19 +238,51 @@ class IP_Camera:
     # Data Retrieval (Public API)
     # =========================================================================
 
+    @property
+    def _last_frame(self):
+        return self._slots[self._active]
+
     def read(self):
         """
-        Thread-safe read. Returns the most recent frame from the buffer.
+        Returns the most recent frame from the buffer.
+        The frame is the reader's ring slot itself, not a copy, and is read-only
+        (writeable=False): call `.copy()` if you need to mutate it. Every frame
+        returned here must be handed back with release() once the caller (and
+        anything it passed the frame to) is done with it; until then the reader
+        won't decode into that slot.
         Returns: (bool, frame)
         """
         if not self.is_open:
             return False, None
 
-        with self._lock:
-            if self._last_frame is None:
-                return False, None
-            # Return a copy to prevent processing threads from modifying the buffer
-            return True, self._last_frame.copy()
+        with self._ring_lock:
+            frame = self._slots[self._active]
+            if frame is not None:
+                ptr = frame.ctypes.data
+                if ptr in self._ring_leases:
+                    self._ring_leases[ptr] += 1
+        return (frame is not None), frame
+
+    def release(self, frame):
+        """Hands a frame from read() back to the reader. No-op for None or frames outside the ring."""
+        if frame is None:
+            return
+        with self._ring_lock:
+            ptr = frame.ctypes.data
+            if self._ring_leases.get(ptr):
+                self._ring_leases[ptr] -= 1
+
+    def as_bgr(self, frame):
+        """Converts a frame from this camera to BGR. No-op unless the capture delivers NV12."""
+        if frame is None or self.frame_format != "NV12":
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_NV12)
+
+    def _luma(self, frame):
+        """Grayscale view of a frame. For NV12 this is the Y plane, no conversion needed."""
+        if self.frame_format == "NV12":
+            return frame[:frame.shape[0] * 2 // 3]
+        return frame
 
     # =========================================================================
     # Thread: Frame Reader (Producer)
@@ -190,8 +314,17 @@ class IP_Camera:
                 continue
 
             ok, frame = False, None
+            grabbed, keep = False, True
             try:
-                ok, frame = self.capture.read()
+                # grab() only demuxes; skipped frames never pay for decode + colour convert
+                t_grab = time.monotonic()
+                grabbed = self.capture.grab()
+                if self._probe_grabs:
+                    self._check_blocking_grab(time.monotonic() - t_grab)
+                keep = self._grab_idx % (self.process_skip_frames + 1) == 0
+                self._grab_idx += 1
+                if grabbed and keep:
+                    ok, frame = self._retrieve_into_ring()
             except Exception as e:
                 self.logger.error(f"Read exception: {e}")
                 ok = False
@@ -199,6 +332,8 @@ class IP_Camera:
             if ok and frame is not None:
                 self._update_frame_buffer(frame)
                 read_errors = 0 # Reset error counter
+            elif grabbed and not keep:
+                read_errors = 0 # Skipped on purpose, stream is alive
             else:
                 read_errors += 1
                 # If we get consecutive read errors, assume connection is dead
@@ -207,19 +342,113 @@ class IP_Camera:
                     self.is_open = False # Trigger reconnect in next loop
                     continue
             
-            # Small sleep to prevent CPU spinning if camera FPS is low
-            # If it's a file, we might want to respect FPS, but for RTSP we pull as fast as possible
-            # to keep the buffer empty.
+            # Files are paced to their FPS. Streams block inside grab() until the next
+            # frame arrives; only a non-blocking capture needs the small anti-spin sleep.
+            # Waiting on the stop event lets close() interrupt the pause immediately.
             if self.is_video_file:
-                time.sleep(1.0 / max(self.fps, 1.0))
-            else:
-                time.sleep(0.005) # 5ms tiny sleep
+                if self.reader_stop_event.wait(1.0 / max(self.fps, 1.0)):
+                    break
+            elif not self.blocking_read:
+                if self.reader_stop_event.wait(0.005): # 5ms tiny sleep
+                    break
+
+    def _check_blocking_grab(self, elapsed):
+        """
+        Counts grabs that return instantly. If every probe grab after connect is
+        instant, the capture does not block and the reader falls back to sleeping.
+        """
+        self._probe_grabs -= 1
+        if elapsed < 0.001:
+            self._fast_grabs += 1
+        if self._probe_grabs == 0 and self._fast_grabs >= 5:
+            self.blocking_read = False
+            self.logger.debug(f"{self.device_name}: capture.grab() is non-blocking, pacing reader.")
+
+    def _alloc_ring(self, frame, size=3):
+        """
+        Preallocates decode buffers shaped like the stream's frames.
+        read() hands out the slot itself, so a slot is only reused once every consumer
+        has released it (see _free_slot); the ring grows up to _RING_MAX slots when
+        consumers hold on to frames longer than a few frame intervals.
+        """
+        with self._ring_lock:
+            self._ring_idx = 0
+            self._ring_dev_ptrs = {}
+            self._ring_leases = {}
+            if self.zero_copy:
+                try:
+                    self._ring = []
+                    for _ in range(size):
+                        buf, dev_ptr = _alloc_mapped(frame.shape, frame.dtype)
+                        self._ring.append(buf)
+                        self._ring_dev_ptrs[buf.ctypes.data] = dev_ptr
+                        self._ring_leases[buf.ctypes.data] = 0
+                    return
+                except Exception as e:
+                    self.logger.warning(f"Zero-copy buffers unavailable, using regular memory: {e}")
+                    self._ring_dev_ptrs = {}
+                    self._ring_leases = {}
+            self._ring = [np.empty_like(frame) for _ in range(size)]
+            for buf in self._ring:
+                self._ring_leases[buf.ctypes.data] = 0
+
+    def _free_slot(self):
+        """
+        Next ring slot with no outstanding read() lease that isn't the published
+        frame (read() may lease that one at any moment), growing the ring if all are
+        taken. Returns None at _RING_MAX, the caller then decodes into a fresh,
+        unpooled array.
+        """
+        with self._ring_lock:
+            current = self._slots[self._active]
+            published = current.ctypes.data if current is not None else None
+            for _ in range(len(self._ring)):
+                buf = self._ring[self._ring_idx]
+                self._ring_idx = (self._ring_idx + 1) % len(self._ring)
+                ptr = buf.ctypes.data
+                if ptr != published and self._ring_leases.get(ptr, 0) == 0:
+                    return buf
+            if len(self._ring) < _RING_MAX:
+                buf = np.empty_like(self._ring[0])
+                self._ring.append(buf)
+                self._ring_leases[buf.ctypes.data] = 0
+                return buf
+        return None
+
+    def device_ptr(self, frame):
+        """
+        CUDA device pointer for a frame living in a mapped ring buffer, else None.
+        Lets CUDA consumers use the frame in place instead of uploading it.
+        """
+        if frame is None:
+            return None
+        return self._ring_dev_ptrs.get(frame.ctypes.data)
+
+    def _retrieve_into_ring(self):
+        """retrieve() writes in place when the destination matches the frame's shape/type."""
+        buf = self._free_slot() if self._ring else None
+        if buf is None:
+            return self.capture.retrieve()
+        # Slots are read-only while published; only the reader writes into them
+        buf.flags.writeable = True
+        return self.capture.retrieve(buf)
 
     def _update_frame_buffer(self, frame):
+        # Consumers share the published frame (and possibly its ring slot): read-only for them
+        frame.flags.writeable = False
         processed_frame = self._apply_rotation(frame)
-        with self._lock:
-            self._last_frame = processed_frame
-            self._last_frame_time = time.time()
+        dev_ptr = self.device_ptr(processed_frame)
+        if dev_ptr is not None:
+            processed_frame = processed_frame.view(FrameView)
+            processed_frame.device_ptr = dev_ptr
+        processed_frame.flags.writeable = False
+        # Single writer: fill the slot readers aren't looking at, then publish it
+        spare = 1 - self._active
+        with self._ring_lock:
+            self._slots[spare] = processed_frame
+            self._active = spare
+        self._last_frame_time = time.time()
+        self.frame_id += 1
 
     # =========================================================================
     # Thread: Health Monitor
@@ -241,7 +470,8 @@ class IP_Camera:
 
     def _health_loop(self, interval):
         while not self.health_stop_event.is_set():
-            time.sleep(interval)
+            if self.health_stop_event.wait(interval):
+                break
             
             try:
                 # Check 1: Signal Freshness
@@ -252,13 +482,18 @@ class IP_Camera:
                 self.is_connected = time_since_last_frame < threshold
 
                 # Check 2: Image Integrity
-                frame_sample = None
-                with self._lock:
-                    if self._last_frame is not None:
-                        frame_sample = self._last_frame.copy()
-
-                if self.is_connected and frame_sample is not None:
-                    is_healthy, reasons = self.health_validator.validate(frame_sample)
+                # Lease the frame (no copy) so the reader can't decode into it mid-resize;
+                # the thumbnail below is the only copy made
+                _, frame_sample = self.read()
+                thumb = None
+                try:
+                    if self.is_connected and frame_sample is not None:
+                        thumb = cv2.resize(self._luma(frame_sample), (256, 256), interpolation=cv2.INTER_AREA)
+                finally:
+                    self.release(frame_sample)
+
+                if thumb is not None:
+                    is_healthy, reasons = self.health_validator.validate(thumb)
                     self.is_corrupted = not is_healthy
                     self.health_issues = reasons
                 else:
@@ -302,7 +537,8 @@ class IP_Camera:
         self.logger.info(f"Closed {self.device_name}.")
 
     def _apply_rotation(self, frame):
-        if self.rotation == 0: return frame
+        # GStreamer paths rotate in the pipeline; only FFmpeg/file captures get here
+        if self.rotation == 0 or self._rotated_in_pipeline: return frame
         elif self.rotation == 90: return cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
         elif self.rotation == 180: return cv2.rotate(frame, cv2.ROTATE_180)
         elif self.rotation == 270: return cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
@@ -311,13 +547,20 @@ class IP_Camera:
     def _extract_metadata(self, frame):
         self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
         h, w = frame.shape[:2]
-        if self.rotation in (90, 270):
+        if self.frame_format == "NV12":
+            h = h * 2 // 3 # Y plane + half-height interleaved UV plane
+        # Frames rotated in the pipeline already have post-rotation dimensions
+        if self.rotation in (90, 270) and not self._rotated_in_pipeline:
             self.frame_width, self.frame_height = h, w
         else:
             self.frame_width, self.frame_height = w, h
 
     def _detect_stream_codec(self) -> str:
-        """Uses ffprobe to peek at the stream and guess the codec."""
+        """Uses ffprobe to peek at the stream and guess the codec. Cached per stream."""
+        cached = _CODEC_CACHE.get(self.ip_address)
+        if cached:
+            return cached
+
         try:
             cmd = [
                 "ffprobe", "-v", "quiet", "-select_streams", "v:0",
@@ -328,12 +571,32 @@ class IP_Camera:
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
             if result.returncode == 0:
                 codec = result.stdout.strip().lower()
-                if "hevc" in codec or "265" in codec: return "h265"
+                codec = "h265" if ("hevc" in codec or "265" in codec) else "h264"
+                # Only cache real answers; a failed probe (camera down) is retried next time
+                _CODEC_CACHE[self.ip_address] = codec
+                return codec
             return "h264" # Default
         except Exception:
             return "h264"
 
-    def _gst_pipeline(self, uri: str, codec: str = "h264", latency_ms: int = 200) -> str:
+    def _resolve_hwaccel(self, codec: str = "h264") -> str:
+        """
+        Picks the decoder backend. 'auto' probes for NVDEC, then VAAPI, then V4L2 (RPi),
+        and falls back to CPU (avdec) if none are installed.
+        """
+        if self.hwaccel != "auto":
+            return self.hwaccel
+
+        c = "h265" if codec.lower() == "h265" else "h264"
+        if _gst_has_element("nvv4l2decoder"):
+            return "nvidia"
+        if _gst_has_element(f"vaapi{c}dec"):
+            return "vaapi"
+        if _gst_has_element(f"v4l2{c}dec"):
+            return "v4l2"
+        return "cpu"
+
+    def _gst_pipeline(self, uri: str, codec: str = "h264", latency_ms: int = 200, hwaccel: str = None) -> str:
         """
         Constructs a low-latency GStreamer pipeline.
         appsink drop=true max-buffers=1 is CRITICAL for low latency AI.
@@ -341,17 +604,40 @@ class IP_Camera:
         c = codec.lower()
         depay = "rtph264depay" if c == "h264" else "rtph265depay"
         parse = "h264parse" if c == "h264" else "h265parse"
-        decoder = "avdec_h264" if c == "h264" else "avdec_h265"
-        
+        c = "h264" if c == "h264" else "h265"
+        backend = hwaccel or self._resolve_hwaccel(c)
+
+        # Decode stage per backend. Hardware decoders keep the CPU near-idle.
+        # For BGR output only the final colour conversion runs in software;
+        # NV12 is the decoders' native layout so hardware paths skip videoconvert.
+        # Fixed rotations are fused into the converter (nvvidconv/vaapipostproc) or done
+        # by videoflip on the decoder's YUV output, instead of cv2.rotate on BGR frames.
+        bgr = self.pixel_format != "NV12"
+        direction = {90: "90r", 180: "180", 270: "90l"}.get(self.rotation)
+        flip_method = {90: 3, 180: 2, 270: 1}.get(self.rotation) # nvvidconv numbering
+        if backend == "nvidia":
+            decode = "nvv4l2decoder ! nvvidconv"
+            if flip_method:
+                decode += f" flip-method={flip_method}"
+            if bgr:
+                decode += " ! video/x-raw,format=BGRx ! videoconvert"
+        elif backend == "vaapi":
+            decode = f"vaapi{c}dec ! vaapipostproc"
+            if direction:
+                decode += f" video-direction={direction}"
+            if bgr:
+                decode += " ! video/x-raw,format=NV12 ! videoconvert"
+        else:
+            decoder = f"v4l2{c}dec" if backend == "v4l2" else f"avdec_{c}"
+            flip = f" ! videoflip video-direction={direction}" if direction else ""
+            decode = f"{decoder}{flip} ! videoconvert"
+
         # Notes:
         # protocols=tcp: More stable than UDP for AI, prevents grey artifacts from packet loss.
         # drop=true: If the AI is slow, drop old frames. Don't queue them.
         return (
             f"rtspsrc location={uri} protocols=tcp latency={latency_ms} ! "
-            f"{depay} ! {parse} ! {decoder} ! videoconvert ! "
-            f"video/x-raw,format=BGR ! "
+            f"{depay} ! {parse} ! {decode} ! "
+            f"video/x-raw,format={self.pixel_format} ! "
             f"appsink drop=true max-buffers=1 sync=false"
         )
-
-    def _signal_handler(self, signum, frame):
-        self.close()l
\ No newline at end of file
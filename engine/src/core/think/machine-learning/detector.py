@@ -7,6 +7,8 @@ import datetime
 import time
 import os
 import glob
+import io
+import tarfile
 import numpy as np
 from collections import deque
 from src.utils import plot
@@ -19,6 +21,7 @@ from src.core.actuators.frame_handler import FrameHandler
 from src.core.think.manager.zone_manager import ZoneManager
 from shapely.geometry import Point, Polygon, LineString, box
 from src.core.think.manager.universal_predictor import UniversalPredictor
+from src.core.think.manager.shared_predictor import SharedPredictor
 from src.core.think.machine_learning.computer_vision.safety_tracker import SecurityModule
 
 
@@ -41,14 +44,39 @@ class Detector:
 
         # Get model configuration
         self.model_config = self._get_model_config(config)
+
+        # Batched inference: buffer N frames and run one forward pass for all of them.
+        # A partial batch is flushed once its oldest frame has waited batch_max_wait seconds.
+        self.batch_size = max(1, int(config.get('batch_size', 1)))
+        self.batch_max_wait = float(config.get('batch_max_wait', 1.0))
+        self.model_config.setdefault('batch', self.batch_size)
+        if config.get("shared_predictor", False):
+            # The shared engine batches the frames of every camera on this model, size it for that
+            self.model_config['batch'] = max(int(self.model_config['batch']), int(config.get('shared_batch_size', 8)))
+        self._pending = []
+        self._pending_deadline = None # time.monotonic() by which the pending batch is flushed
+
+        if self.model_config.get('convert_engine'):
+            self._prepare_engine(self.model_config)
         
         # Initialize Universal Predictor
-        self.predictor = UniversalPredictor(
-            model_config=self.model_config,
-            device=self.device,
-            logger=self.logger,
-            plot_overlays=config.get("plot_overlays", True),
-        )
+        if config.get("shared_predictor", False):
+            # One engine for every camera on this model/device, frames micro-batched across streams
+            self.predictor = SharedPredictor.acquire(
+                stream_id=getattr(config.get('ip_camera'), 'device_name', None),
+                model_config=self.model_config,
+                device=self.device,
+                logger=self.logger,
+                plot_overlays=config.get("plot_overlays", True),
+                max_wait=config.get("shared_max_wait", 0.005),
+            )
+        else:
+            self.predictor = UniversalPredictor(
+                model_config=self.model_config,
+                device=self.device,
+                logger=self.logger,
+                plot_overlays=config.get("plot_overlays", True),
+            )
         self.logger.info(f"Universal Predictor initialized with {self.model_config['model_type']} model.")
 
         self.ip_camera = config.get('ip_camera')
@@ -63,8 +91,10 @@ class Detector:
         # Initialize Security Module if enabled
         self.security_module = None
         if config.get("security_enabled", False):
-            _, frame = self.ip_camera.capture.read()
-            template_frame = frame
+            _, frame = self.ip_camera.read()
+            # The module keeps its template; read() frames go back to the camera's ring
+            template_frame = frame.copy() if frame is not None else None
+            self.ip_camera.release(frame)
             self.security_module = SecurityModule(self.device_name, template_frame)
             self.logger.info("Security Module Initialized.")
 
@@ -73,6 +103,7 @@ class Detector:
         self.zone_manager = ZoneManager(logger=self.logger, camera={"device_name": self.device_name})
         self.zone_manager.zones = list(self.zones or [])  
         self.zone_manager.set_zones()
+        self._zone_arrays = None
         
         if self.is_video_file:
             self.video_path = self.ip_camera.ip_address
@@ -80,6 +111,9 @@ class Detector:
             self.video_path = None
 
         self.rotation = self.ip_camera.rotation
+        # Frames come from ip_camera.read(), already upright: the camera rotates them in the
+        # capture pipeline (flip-method/videoflip) or in its reader thread
+        self.rotate_in_detector = False
         if self.rotation in [90, 270]:
             rotated_frame_size = (int(self.ip_camera.frame_height), int(self.ip_camera.frame_width))
         else:
@@ -99,7 +133,20 @@ class Detector:
         self.store_crops_flag = False
         if self.store_crops_flag:
             self.crop_dir = "./results/track_ids/"
+            # Crops are JPEG-encoded by worker threads, off the frame path, and appended to one
+            # tar per (date, device) instead of one file each in a deep directory tree
+            self._crop_lock = threading.Lock()
+            self._crop_tars = {}
+            self._crop_index = {}  # "<tar>::<member>" -> (data offset, size)
+            self._crop_queue = queue.Queue(maxsize=256)
+            self._crop_workers = [
+                threading.Thread(target=self._crop_writer, daemon=True) for _ in range(2)
+            ]
+            for worker in self._crop_workers:
+                worker.start()
             
+        # FrameHandler runs in this process (thread pools), so submit() hands over the ndarray by
+        # reference; no pickling or shared-memory staging is needed for the raw/plotted frames.
         self.frame_handler = FrameHandler(
             device_name=self.device_name,
             base_dir="./results/frames",
@@ -117,6 +164,11 @@ class Detector:
             logger=self.logger
         )
 
+        # One long-lived worker stores detection results; the oldest result is dropped when it falls behind
+        self._results_q = queue.Queue(maxsize=32)
+        self._results_worker = threading.Thread(target=self._results_loop, daemon=True)
+        self._results_worker.start()
+
     def _get_model_config(self, config):
         """
         Get model configuration from config or database.
@@ -141,7 +193,7 @@ class Detector:
     def _load_model_config_from_db(self, model_name):
         """Load model configuration from MongoDB collection"""
         try:
-            model_doc = Model.objects(model_name=model_name).first()
+            model_doc = Models.objects(model_name=model_name).first()
             if model_doc:
                 config = model_doc.to_mongo().to_dict()
                 # Convert to expected format
@@ -150,6 +202,10 @@ class Detector:
                     'model_path': config.get('model_path'),
                     'tracker_path': config.get('tracker_path'),
                     'convert_engine': config.get('convert_engine', False),
+                    'half': config.get('half', True),
+                    'imgsz': config.get('imgsz', 640),
+                    'int8': config.get('int8', False),
+                    'calib_data': config.get('calib_data'),
                     'conf': config.get('conf', 0.6),
                     'class_ids': config.get('class_ids', [0])
                 }
@@ -169,13 +225,111 @@ class Detector:
                 'model_type': 'YOLO',
                 'model_path': "src/models/Iskcon_head_detection_yolov8m_15_aug.pt",
                 'tracker_path': "src/configs/machine_learning/computer_vision/tracker/botsort_with_reid.yaml",
-                'convert_engine': False,  # Set to True if you want TensorRT conversion
+                'convert_engine': False,  # Set to True for a TensorRT FP16 engine, exported once next to the .pt
+                'half': True,
+                'imgsz': 640,
+                'int8': False,  # With convert_engine + calib_data; falls back to FP16 if accuracy drops
+                'calib_data': None,
                 'conf': 0.6,
                 'class_ids': [0, 1]
             }
         else:
             raise ValueError(f"Unsupported model_type: {model_type}")
 
+    def _prepare_engine(self, model_config):
+        """
+        Export the .pt model to a TensorRT engine once and point model_config at it.
+        The engine is cached next to the .pt and reused on later runs. With batch 1 the
+        shapes are fixed (dynamic=False), so min/opt/max are equal and the builder does not reserve
+        workspace for every possible shape. A larger batch is only the engine's maximum
+        (dynamic=True): partial batches, the final flush and single-frame predicts run
+        fewer images than that, which a static engine rejects.
+
+        With int8 enabled the engine is calibrated on calib_data (the calibration cache
+        is written next to the .pt, so later exports skip calibration) and validated
+        against the FP16 engine; if mAP50-95 drops by more than int8_max_map_drop the
+        FP16 engine is used instead.
+        """
+        model_path = model_config.get('model_path')
+        if not model_path or not model_path.endswith('.pt'):
+            return
+
+        engine_path = None
+        if model_config.get('int8'):
+            calib_data = model_config.get('calib_data')
+            if calib_data and os.path.exists(calib_data):
+                engine_path = self._export_engine(model_path, model_config, 'int8')
+            else:
+                self.logger.warning(f"INT8 calibration data '{calib_data}' not found, falling back to FP16")
+
+        fp_engine_path = self._export_engine(
+            model_path, model_config, 'fp16' if model_config.get('half', True) else 'fp32'
+        )
+        if engine_path and fp_engine_path:
+            engine_path = self._check_int8_accuracy(engine_path, fp_engine_path, model_config)
+        engine_path = engine_path or fp_engine_path
+        if not engine_path:
+            return
+
+        model_config['model_path'] = engine_path
+        # Already converted; the predictor loads the engine as-is
+        model_config['convert_engine'] = False
+
+    def _export_engine(self, model_path, model_config, precision):
+        """Export (or reuse) the engine for one precision, returns its path or None on failure"""
+        batch = model_config.get('batch', 1)
+        imgsz = model_config.get('imgsz', 640)
+        # Batch 1 is static; above it the batch is the maximum of a 1..batch profile
+        dynamic = batch > 1
+        engine_path = f"{os.path.splitext(model_path)[0]}_b{batch}{'dyn' if dynamic else ''}_{imgsz}_{precision}.engine"
+        if os.path.exists(engine_path):
+            return engine_path
+
+        self.logger.info(f"Exporting {model_path} to TensorRT ({precision.upper()}, batch={batch})")
+        try:
+            if precision == 'int8':
+                exported = YOLO(model_path).export(
+                    format='engine', int8=True, data=model_config['calib_data'], dynamic=dynamic,
+                    imgsz=imgsz, batch=batch, workspace=4, device=self.device
+                )
+            else:
+                exported = YOLO(model_path).export(
+                    format='engine', half=precision == 'fp16', dynamic=dynamic, imgsz=imgsz,
+                    batch=batch, workspace=2, device=self.device
+                )
+            os.replace(exported, engine_path)
+        except Exception as e:
+            self.logger.warning(f"TensorRT {precision.upper()} export failed for {model_path}: {e}")
+            return None
+        return engine_path
+
+    def _check_int8_accuracy(self, int8_path, fp_path, model_config):
+        """Validate the INT8 engine against the FP engine once; the verdict is cached in a marker file"""
+        rejected_marker = f"{int8_path}.rejected"
+        accepted_marker = f"{int8_path}.accepted"
+        if os.path.exists(rejected_marker):
+            return None
+        if os.path.exists(accepted_marker):
+            return int8_path
+
+        data = model_config.get('val_data', model_config['calib_data'])
+        kwargs = dict(data=data, imgsz=model_config.get('imgsz', 640),
+                      batch=model_config.get('batch', 1), device=self.device, verbose=False)
+        try:
+            int8_map = YOLO(int8_path, task='detect').val(**kwargs).box.map
+            fp_map = YOLO(fp_path, task='detect').val(**kwargs).box.map
+        except Exception as e:
+            self.logger.warning(f"INT8 accuracy check failed, falling back to FP16: {e}")
+            return None
+
+        max_drop = model_config.get('int8_max_map_drop', 0.01)
+        accepted = fp_map - int8_map <= max_drop
+        self.logger.info(
+            f"INT8 mAP50-95 {int8_map:.4f} vs {fp_map:.4f}: {'using INT8' if accepted else 'falling back to FP16'}"
+        )
+        open(accepted_marker if accepted else rejected_marker, 'w').close()
+        return int8_path if accepted else None
+
     def _get_center(self, bbox):
         """Calculate center point of bounding box"""
         x_center = (bbox[0] + bbox[2]) / 2
@@ -185,7 +339,7 @@ class Detector:
     def predict(self, frame, current_time, frame_number):
         """Updated predict method using UniversalPredictor"""
         # Rotate frame if needed
-        if self.rotation != 0:
+        if self.rotate_in_detector:
             frame = self.rotate_frame(frame, self.rotation)
 
         start_time = time.time()
@@ -200,11 +354,56 @@ class Detector:
             run_time_str=self.run_time_str
         )
 
-        
+        return self._finish_frame(frame, track_ids_dict, current_time, frame_number, start_time, raw_path)
 
+    def predict_batch(self, items):
+        """
+        Batched counterpart of predict() for a list of (frame, current_time, frame_number).
+        Runs a single forward pass for all frames via UniversalPredictor.predict_batch
+        (a list of (track_ids_dict, plotted_frame), one per input frame), then handles
+        each frame's results exactly like predict().
+        """
+        if self.rotate_in_detector:
+            items = [(self.rotate_frame(f, self.rotation), t, n) for f, t, n in items]
+
+        start_time = time.time()
+
+        raw_paths = [
+            self.frame_handler.submit(f, ts_utc=t, frame_number=int(n), kind="raw")
+            for f, t, n in items
+        ]
+        current_times = [t for _, t, _ in items]
+        if hasattr(self.predictor, "predict_batch"):
+            results = self.predictor.predict_batch(
+                frames=np.stack([f for f, _, _ in items]),
+                current_times=current_times,
+                run_time_str=self.run_time_str
+            )
+        else:
+            # Predictor without batch support: same results, one forward per frame
+            results = [
+                self.predictor.predict(frame=f, current_time=t, run_time_str=self.run_time_str)
+                for f, t, _ in items
+            ]
+
+        # Each frame is charged its share of the batch's inference time
+        share = (time.time() - start_time) / len(items)
+        frames = []
+        for (_, current_time, frame_number), (track_ids_dict, frame), raw_path in zip(items, results, raw_paths):
+            frames.append(self._finish_frame(
+                frame, track_ids_dict, current_time, frame_number, time.time() - share, raw_path
+            ))
+        return frames
+
+    def _finish_frame(self, frame, track_ids_dict, current_time, frame_number, start_time, raw_path):
+        """Zone overlay, plotted-frame save and result dispatch for one predicted frame."""
         # Plot zones if available
-        if getattr(self.zone_manager, "zone_dict", None):
-            frame = plot.plot_shapes(frame, self.zone_manager.zone_dict)
+        zone_dict = getattr(self.zone_manager, "zone_dict", None)
+        if zone_dict:
+            # Zone drawing data is rebuilt only when the zone manager swaps its zone dict
+            if self._zone_arrays is None or self._zone_arrays.source is not zone_dict:
+                self._zone_arrays = plot.prepare_shapes(zone_dict)
+            frame = plot.plot_shapes(frame, zone_dict, arrays=self._zone_arrays)
             
         plotted_path = self.frame_handler.submit(
             frame, ts_utc=current_time, frame_number=int(frame_number), kind="plotted"
@@ -213,11 +412,6 @@ class Detector:
         end_time = time.time()
         inference_time = end_time - start_time
 
-        # Process detection results in thread
-        _ = self.process_detection_results_thread(
-            track_ids_dict, frame, current_time, frame_number, inference_time, raw_path, plotted_path
-        )
-
         # Update zonal relationships
         if getattr(self, "zone_manager", None) and track_ids_dict:
             track_ids_dict = self.zone_manager.update_track_ids_status(track_ids_dict)
@@ -225,7 +419,12 @@ class Detector:
 
         # Save crops
         if self.store_crops_flag and track_ids_dict:
-            track_ids_dict = self.store_crops(frame, track_ids_dict)
+            track_ids_dict = self.store_crops(frame, track_ids_dict, current_time)
+
+        # Store the fully annotated results in thread
+        _ = self.process_detection_results_thread(
+            track_ids_dict, frame, current_time, frame_number, inference_time, raw_path, plotted_path
+        )
 
         return frame
     
@@ -240,22 +439,27 @@ class Detector:
         else:
             return frame
 
-    def process_detection_results(self, arg_queue):
-        """Process detection results in separate thread"""
-        track_ids_dict, frame, current_time, frame_number, inference_time, raw_path, plotted_path = arg_queue.get()
-        arg_queue.task_done()
+    def _results_loop(self):
+        """Worker loop behind process_detection_results_thread"""
+        while True:
+            args = self._results_q.get()
+            try:
+                if args is None:
+                    break
+                self.process_detection_results(args)
+            except Exception as e:
+                self.logger.error(f"Error processing detection results: {e}")
+            finally:
+                self._results_q.task_done()
+
+    def process_detection_results(self, args):
+        """Process detection results on the results worker"""
+        track_ids_dict, frame, current_time, frame_number, inference_time, raw_path, plotted_path = args
 
         if not track_ids_dict:
             track_ids_dict = {}  
 
-        if self.zone_manager:
-            track_ids_dict = self.zone_manager.update_track_ids_status(track_ids_dict)
-            if self.zone_manager.zone_dict:
-                frame = plot.plot_shapes(frame, self.zone_manager.zone_dict)
-
-        if self.store_crops_flag and track_ids_dict:
-            track_ids_dict = self.store_crops(frame, track_ids_dict)
-
+        # Zones, overlays and crops were already handled in _finish_frame
         if self.metadata_handler:
             processed_data = {
                 "time_stamp": current_time,
@@ -267,16 +471,24 @@ class Detector:
             }
             self.metadata_handler.process(processed_data)
 
-    def store_crops(self, frame, track_ids_dict):
-        """Store cropped images of detected objects"""
+    def store_crops(self, frame, track_ids_dict, current_datetime=None):
+        """
+        Store cropped images of detected objects.
+        current_datetime is the frame's capture time; all crops of the frame share it.
+        """
+        if current_datetime is None:
+            current_datetime = datetime.datetime.now(datetime.timezone.utc)
+        date = str(current_datetime.date())
+        current_time = current_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
         track_id_path_list = []
+        h, w = frame.shape[:2]
         for track_id, obj_info in track_ids_dict.items():
             bbox = obj_info["bbox"]
             label = obj_info["label_name"]
 
             x1, y1, x2, y2 = map(int, bbox)
             P = 10
-            h, w = frame.shape[:2]
             x1p, y1p = max(0, x1 - P), max(0, y1 - P)
             x2p, y2p = min(w, x2 + P), min(h, y2 + P)
             if x2p <= x1p or y2p <= y1p:
@@ -286,10 +498,6 @@ class Detector:
             if crop.size == 0:
                 continue
 
-            current_datetime = datetime.datetime.now(datetime.timezone.utc)
-            date = str(current_datetime.date())
-            current_time = current_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-            
             # Check if instance_dict exists (zone information)
             instance_dict = obj_info.get("instance_dict", {})
 
@@ -299,54 +507,103 @@ class Detector:
                     if instance_dict[zone_name_index]['location'] == "inside":
                         zone_name = zone_name_index.replace(" ", "_")
                         file_name = f"{current_time}-{label}-{instance_dict[zone_name_index]['location']}-{zone_name}.jpg"
-                        track_id_dir = os.path.join(self.crop_dir, date, self.device_name, zone_name, track_id)
-
-                        if not os.path.exists(track_id_dir):
-                            os.makedirs(track_id_dir, exist_ok=True)
-
-                        out_fp = os.path.join(track_id_dir, file_name)
-                        if cv2.imwrite(str(out_fp), crop):
+                        out_fp = self._queue_crop(crop, date, zone_name, track_id, file_name)
+                        if out_fp:
                             track_id_path_list.append(out_fp)
                             not_saved = False
 
                 if not_saved:
                     zone_name = "no-zone"
                     file_name = f"{current_time}-{label}-_-{zone_name}.jpg"
-                    track_id_dir = os.path.join(self.crop_dir, date, self.device_name, zone_name, track_id)
-
-                    if not os.path.exists(track_id_dir):
-                        os.makedirs(track_id_dir, exist_ok=True)
-
-                    out_fp = os.path.join(track_id_dir, file_name)
-                    if cv2.imwrite(str(out_fp), crop):
+                    out_fp = self._queue_crop(crop, date, zone_name, track_id, file_name)
+                    if out_fp:
                         track_id_path_list.append(out_fp)
             else:
                 # No zone information, save in no-zone folder
                 zone_name = "no-zone"
                 file_name = f"{current_time}-{label}-_-{zone_name}.jpg"
-                track_id_dir = os.path.join(self.crop_dir, date, self.device_name, zone_name, track_id)
-
-                if not os.path.exists(track_id_dir):
-                    os.makedirs(track_id_dir, exist_ok=True)
-
-                out_fp = os.path.join(track_id_dir, file_name)
-                if cv2.imwrite(str(out_fp), crop):
+                out_fp = self._queue_crop(crop, date, zone_name, track_id, file_name)
+                if out_fp:
                     track_id_path_list.append(out_fp)
 
             track_ids_dict[track_id]["track_id_path_list"] = track_id_path_list
 
         return track_ids_dict
 
+    def _queue_crop(self, crop, date, zone_name, track_id, file_name):
+        """
+        Hand a crop to the writer threads.
+        Returns its location as "<tar path>::<member>" or None if it was dropped.
+        """
+        container = os.path.join(self.crop_dir, date, f"{self.device_name}.tar")
+        member = f"{zone_name}/{track_id}/{file_name}"
+        try:
+            # The crop is a view into the frame, which the caller keeps drawing on
+            self._crop_queue.put_nowait((crop.copy(), container, member))
+        except queue.Full:
+            self.logger.warning(f"Crop queue full, dropping {member}")
+            return None
+        return f"{container}::{member}"
+
+    def _crop_writer(self):
+        """Encode queued crops in parallel and append them to their tar under a lock"""
+        while True:
+            item = self._crop_queue.get()
+            if item is None:
+                self._crop_queue.task_done()
+                break
+            crop, container, member = item
+            try:
+                ok, buf = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                if not ok:
+                    continue
+                data = buf.tobytes()
+                info = tarfile.TarInfo(member)
+                info.size = len(data)
+                info.mtime = time.time()
+                with self._crop_lock:
+                    tar = self._crop_tar(container)
+                    offset_data = tar.offset + len(info.tobuf(tar.format, tar.encoding, tar.errors))
+                    tar.addfile(info, io.BytesIO(data))
+                    tar.fileobj.flush()
+                    self._crop_index[f"{container}::{member}"] = (offset_data, info.size)
+            except Exception as e:
+                self.logger.error(f"Failed to write crop {member} to {container}: {e}")
+            finally:
+                self._crop_queue.task_done()
+
+    def _crop_tar(self, container):
+        """Open tar for this container; called with _crop_lock held. Tars of previous days are closed."""
+        tar = self._crop_tars.get(container)
+        if tar is None:
+            for old in self._crop_tars.values():
+                old.close()
+            self._crop_tars.clear()
+            os.makedirs(os.path.dirname(container), exist_ok=True)
+            tar = tarfile.open(container, mode='a')
+            self._crop_tars[container] = tar
+        return tar
+
     def process_detection_results_thread(self, results, frame, current_time, frame_number, inference_time, raw_path, plotted_path):
-        """Create thread for processing detection results"""
-        arg_queue = queue.Queue(maxsize=1)
-        arg_queue.put((results, frame, current_time, frame_number, inference_time, raw_path, plotted_path))
-
-        thread = threading.Thread(target=self.process_detection_results, args=(arg_queue,))
-        thread.daemon = True
-        thread.start()
-        return thread
+        """Queue detection results for the results worker"""
+        args = (results, frame, current_time, frame_number, inference_time, raw_path, plotted_path)
+        while True:
+            try:
+                self._results_q.put_nowait(args)
+                return self._results_worker
+            except queue.Full:
+                try:
+                    self._results_q.get_nowait()
+                    self._results_q.task_done()
+                    self.logger.warning("Detection results queue full, dropped the oldest result")
+                except queue.Empty:
+                    pass
     
+    def _flush_pending(self):
+        """Runs the buffered frames as one batch, full or not."""
+        pending, self._pending = self._pending, []
+        self.predict_batch(pending)
+
     def process(self):
         """
         Main loop for live camera processing with universal model detection.
@@ -359,7 +616,7 @@ class Detector:
         descriptor = f"Processing {self.device_name} Live Stream with {self.model_config['model_type']} Detection"
         self.logger.info(descriptor)
 
-        interval = datetime.timedelta(seconds=1 / self.target_fps)
+        interval = 1 / self.target_fps
         last_proc_time = None
         
         frame_number = 0
@@ -368,33 +625,68 @@ class Detector:
         
         self.no_frame_count = 0
         self.cam_result = True
+        last_frame_id = None
+
+        # The camera's reader thread owns the VideoCapture (grab/retrieve aren't thread-safe);
+        # frames are only taken through ip_camera.read(). No-op when the engine started it already.
+        self.ip_camera.start_reader_loop()
         
         try:
             while self.ip_camera.is_open and self.cam_result:
-                current_time = datetime.datetime.now(datetime.timezone.utc)
-
-                if last_proc_time is not None and (current_time - last_proc_time) < interval:
+                # Rate limiting on the monotonic clock; the wall-clock timestamp is taken once per processed frame
+                now = time.monotonic()
+                # Checked on every pass, including the no-frame and repeated-frame ones: a stalled
+                # stream never delivers the frame that would complete the batch
+                if self._pending and now >= self._pending_deadline:
+                    self._flush_pending()
+                if last_proc_time is not None and (now - last_proc_time) < interval:
+                    time.sleep(interval - (now - last_proc_time))
                     continue
-                last_proc_time = current_time
 
-                self.cam_result, frame = self.ip_camera.capture.read()
+                ret, frame = self.ip_camera.read()
 
-                if frame is None:
+                if not ret or frame is None:
                     self.no_frame_count += 1
                     if self.no_frame_count >= 10:
                         break
-                    else:
-                        continue
+                    time.sleep(0.1)
+                    continue
+                self.no_frame_count = 0
 
-                frame_number = self.ip_camera.capture.get(cv2.CAP_PROP_POS_FRAMES)
+                frame_id = self.ip_camera.frame_id
+                if frame_id == last_frame_id:
+                    self.ip_camera.release(frame)
+                    time.sleep(0.005) # Ahead of the camera; wait for a new frame
+                    continue
+                last_frame_id = frame_id
+                frame_number = frame_id
+                # The rate limit counts from frames actually taken, not from polls for a new one
+                last_proc_time = now
+                current_time = datetime.datetime.now(datetime.timezone.utc)
 
-                if frame is not None and self.cam_result:
-                    raw_frame = frame.copy()
-                    processed_frame = self.predict(raw_frame, current_time, frame_number)
+                if frame is not None:
+                    # predict draws on the frame. read() hands out the camera's read-only ring slot,
+                    # so that is copied; an NV12 frame converted by as_bgr() is already private
+                    # and only copied when the security module needs it untouched
+                    slot = frame
+                    raw_frame = self.ip_camera.as_bgr(frame)
+                    if raw_frame is slot or self.security_module:
+                        frame = raw_frame.copy()
+                    else:
+                        frame = raw_frame
+                    if self.batch_size > 1:
+                        if not self._pending:
+                            self._pending_deadline = now + self.batch_max_wait
+                        self._pending.append((frame, current_time, frame_number))
+                        if len(self._pending) >= self.batch_size:
+                            self._flush_pending()
+                    else:
+                        processed_frame = self.predict(frame, current_time, frame_number)
                     
                     # If Security Module is enabled, process security features
                     if self.security_module:
                         self.security_module.process_frame(raw_frame)
+                    self.ip_camera.release(slot)
 
                     if frame_number % 100 == 0 and video_doc:
                         video_doc.status = f"processing ({frame_number} frames done)"
@@ -411,17 +703,37 @@ class Detector:
                 self.logger.info(f"🛑 Stopping RTSP stream for {self.device_name}")
                 self.rtsp_streamer.stop_device_stream(self.device_name)
 
+            # Run whatever is left of a partial batch
+            if self._pending:
+                self._flush_pending()
+
             # Clean up predictor
             if hasattr(self, 'predictor'):
                 self.predictor.finish()
 
-            if self.ip_camera.capture:
-                self.ip_camera.capture.release()
+            # Stops the reader thread before releasing the capture it reads from
+            self.ip_camera.close()
 
             status = "Finally"
             if hasattr(self, "frame_handler") and self.frame_handler:
                 self.frame_handler.close()
 
+            # Flush pending crops and stop the writers
+            if getattr(self, "_crop_workers", None):
+                for _ in self._crop_workers:
+                    self._crop_queue.put(None)
+                for worker in self._crop_workers:
+                    worker.join(timeout=5)
+                with self._crop_lock:
+                    for tar in self._crop_tars.values():
+                        tar.close()
+                    self._crop_tars.clear()
+
+            # Let the results worker drain before the metadata handler closes
+            if getattr(self, "_results_worker", None):
+                self._results_q.put(None)
+                self._results_worker.join(timeout=5)
+
             if hasattr(self, 'metadata_handler'):
                 self.metadata_handler.close()
             
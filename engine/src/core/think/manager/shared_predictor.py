@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.core.think.manager.universal_predictor import UniversalPredictor
+
+
+class SharedPredictor:
+    """
+    Process-wide micro-batcher in front of one UniversalPredictor.
+    Detectors of different cameras that use the same model submit frames here; the
+    worker collects up to batch_size frames (or whatever arrived within max_wait)
+    and runs them through predict_batch(frames, current_times, run_time_str), one
+    call per detector run in the batch, then resolves each caller's future.
+
+    The UniversalPredictor (and so its tracker) is shared by every camera on the
+    key: enable shared_predictor only for models whose results don't depend on
+    per-camera tracking state.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, model_config, device, logger=None, plot_overlays=True, max_wait=0.005):
+        self.logger = logger
+        self.batch_size = max(1, int(model_config.get('batch', 8)))
+        self.max_wait = max_wait
+        self.predictor = UniversalPredictor(
+            model_config=model_config,
+            device=device,
+            logger=logger,
+            plot_overlays=plot_overlays,
+        )
+        self._refs = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._batch_loop, daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def acquire(cls, stream_id, model_config, device, logger=None, plot_overlays=True, max_wait=0.005):
+        """
+        Get (or create) the shared predictor for this model/device and return a handle for one stream.
+        The first camera's model_config (batch, conf, classes, ...) is the one every later
+        camera on that key runs with.
+        """
+        key = (model_config.get('model_path'), device)
+        with cls._instances_lock:
+            shared = cls._instances.get(key)
+            if shared is None:
+                shared = cls(model_config, device, logger=logger, plot_overlays=plot_overlays, max_wait=max_wait)
+                cls._instances[key] = shared
+            shared._refs += 1
+        return _StreamHandle(shared, key, stream_id)
+
+    def submit(self, frame, current_time, run_time_str):
+        """Queue one frame, returns a Future resolving to (track_ids_dict, plotted_frame)"""
+        future = Future()
+        self._queue.put((frame, current_time, run_time_str, future))
+        return future
+
+    def _release(self, key):
+        with self._instances_lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            self._instances.pop(key, None)
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+        self.predictor.finish()
+
+    def _batch_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Finish this batch, then stop
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            # predict_batch takes one run_time_str, i.e. one detector run (camera) per call
+            runs = {}
+            for item in batch:
+                runs.setdefault(item[2], []).append(item)
+            for run_time_str, items in runs.items():
+                self._run_batch(run_time_str, items)
+
+    def _run_batch(self, run_time_str, items):
+        frames, current_times, _, futures = zip(*items)
+        try:
+            results = self.predictor.predict_batch(
+                frames=np.stack(frames),
+                current_times=list(current_times),
+                run_time_str=run_time_str
+            )
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Shared predictor batch of {len(items)} failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+class _StreamHandle:
+    """Per-camera view of a SharedPredictor with the UniversalPredictor predict/finish interface"""
+
+    def __init__(self, shared, key, stream_id):
+        self._shared = shared
+        self._key = key
+        self.stream_id = stream_id
+
+    def predict(self, frame, current_time, run_time_str):
+        return self._shared.submit(frame, current_time, run_time_str).result()
+
+    def predict_batch(self, frames, current_times, run_time_str):
+        futures = [
+            self._shared.submit(frame, current_time, run_time_str)
+            for frame, current_time in zip(frames, current_times)
+        ]
+        return [future.result() for future in futures]
+
+    def finish(self):
+        self._shared._release(self._key)
@@ -1,6 +1,10 @@
 import cv2
 import numpy as np
 
+_LEVELS = np.arange(256, dtype=np.float64)
+# Largest frame the k*log2(k) entropy table is built for (256x256 thumbnails: 512 KB)
+_LUT_MAX_PIXELS = 256 * 256
+
 class FrameHealthValidator:
     """
     A utility class to validate the visual quality of camera frames.
@@ -21,11 +25,15 @@ class FrameHealthValidator:
         self.white_thresh = white_thresh
         self.blur_thresh = blur_thresh
         self.black_thresh = black_thresh
+        # k -> k*log2(k) for every possible bin count, rebuilt only when the frame size changes
+        self._xlog2x = None
+        # Reused grayscale destination for BGR input (the monitor validates same-sized thumbnails)
+        self._gray_buf = None
 
     def validate(self, frame):
         """
         Runs all health checks on a single frame.
-        :param frame: BGR numpy array (Opencv image)
+        :param frame: BGR or single-channel luma numpy array (Opencv image)
         :return: (is_healthy: bool, reasons: list[str])
         """
         if frame is None or frame.size == 0:
@@ -33,57 +41,82 @@ class FrameHealthValidator:
 
         reasons = []
         
-        # Convert to grayscale once for all checks
+        # Convert to grayscale once for all checks. Luma input (e.g. the NV12 Y plane) is used as-is.
         if len(frame.shape) == 3:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if self._gray_buf is None or self._gray_buf.shape != frame.shape[:2]:
+                self._gray_buf = np.empty(frame.shape[:2], dtype=np.uint8)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
         else:
             gray = frame
 
-        # 1. Check for Glitch (Entropy & White Screen)
-        is_glitched, glitch_reasons = self._check_glitch(gray)
-        if is_glitched:
-            reasons.extend(glitch_reasons)
+        # One pass over the pixels; entropy, white ratio and mean intensity all come from the 256 bins
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
 
-        # 2. Check for Black Screen
-        is_black, black_val = self._check_black_screen(gray)
+        # 1. Check for Black Screen
+        is_black, black_val = self._check_black_screen(gray, hist)
         if is_black:
             reasons.append(f"Black Screen (Intensity: {black_val:.1f})")
 
-        # 3. Check for Blur
+        # 2. Check for Glitch (Entropy & White Screen)
+        is_glitched, glitch_reasons = self._check_glitch(gray, hist)
+        if is_glitched:
+            reasons.extend(glitch_reasons)
+
+        # 3. Check for Blur, only on frames that passed the cheap checks; a black/white/flat
+        # frame is already unhealthy and would read as blurry anyway
         # (Optional: You might want to disable this for night vision cameras as they are naturally grainy)
-        is_blurry, blur_val = self._check_blur(gray)
-        if is_blurry:
-            reasons.append(f"Blurry (Var: {blur_val:.1f})")
+        if not reasons:
+            is_blurry, blur_val = self._check_blur(gray)
+            if is_blurry:
+                reasons.append(f"Blurry (Var: {blur_val:.1f})")
 
         is_healthy = len(reasons) == 0
         return is_healthy, reasons
 
-    def _calculate_entropy(self, gray_frame):
-        """Calculates Shannon entropy."""
-        hist = cv2.calcHist([gray_frame], [0], None, [256], [0, 256]).ravel()
-        p = hist.astype(np.float64)
-        s = p.sum()
-        if s <= 0: return 0.0
-        p /= s
-        p = p[p > 0]
-        return float(-(p * np.log2(p)).sum())
-
-    def _check_glitch(self, gray_frame):
+    @staticmethod
+    def _histogram(gray_frame):
+        return cv2.calcHist([gray_frame], [0], None, [256], [0, 256]).ravel()
+
+    def _calculate_entropy(self, gray_frame, hist=None):
+        """
+        Calculates Shannon entropy.
+        Works on the 256 histogram bins only: H = log2(N) - sum(h * log2(h)) / N,
+        with h * log2(h) looked up from a table indexed by the integer bin counts.
+        The table has N + 1 entries, so it is only built for frames up to _LUT_MAX_PIXELS
+        (the 256x256 health thumbnails); larger frames compute the 256 terms directly.
+        """
+        if hist is None:
+            hist = self._histogram(gray_frame)
+        n = gray_frame.size
+        if n <= 0: return 0.0
+        if n > _LUT_MAX_PIXELS:
+            h = hist[hist > 0].astype(np.float64)  # 0 * log2(0) := 0
+            return float(np.log2(n) - (h * np.log2(h)).sum() / n)
+        if self._xlog2x is None or len(self._xlog2x) != n + 1:
+            k = np.arange(n + 1, dtype=np.float64)
+            k[0] = 1.0  # 0 * log2(0) := 0
+            self._xlog2x = k * np.log2(k)
+            self._xlog2x[0] = 0.0
+        return float(np.log2(n) - self._xlog2x[hist.astype(np.intp)].sum() / n)
+
+    def _check_glitch(self, gray_frame, hist=None):
         """
         Detects RTSP artifacts (smearing/grey blocks) using entropy 
         and connection loss (pure white screen).
         """
         reasons = []
         is_glitched = False
+        if hist is None:
+            hist = self._histogram(gray_frame)
 
         # Entropy Check
-        entropy_val = self._calculate_entropy(gray_frame)
+        entropy_val = self._calculate_entropy(gray_frame, hist)
         if entropy_val < self.entropy_thresh:
             reasons.append(f"Low Entropy/Glitch (Ent: {entropy_val:.2f})")
             is_glitched = True
 
-        # White Screen Check
-        white_ratio = float(np.sum(gray_frame > 220)) / float(gray_frame.size)
+        # White Screen Check (pixels above 220, read off the histogram)
+        white_ratio = float(hist[221:].sum()) / float(gray_frame.size)
         if white_ratio > self.white_thresh:
             reasons.append(f"White Screen (Ratio: {white_ratio:.2f})")
             is_glitched = True
@@ -93,15 +126,20 @@ class FrameHealthValidator:
     def _check_blur(self, gray_frame):
         """
         Variance of Laplacian method.
+        CV_16S holds every 3x3 Laplacian of uint8 input and is 1/4 the bytes of CV_64F.
         """
-        laplacian_var = cv2.Laplacian(gray_frame, cv2.CV_64F).var()
+        _, std = cv2.meanStdDev(cv2.Laplacian(gray_frame, cv2.CV_16S))
+        laplacian_var = float(std[0, 0]) ** 2
         is_blurry = laplacian_var < self.blur_thresh
         return is_blurry, laplacian_var
 
-    def _check_black_screen(self, gray_frame):
+    def _check_black_screen(self, gray_frame, hist=None):
         """
         Simple mean intensity check.
         """
-        mean_intensity = np.mean(gray_frame)
+        if hist is None:
+            mean_intensity = cv2.mean(gray_frame)[0]
+        else:
+            mean_intensity = float(np.dot(_LEVELS, hist)) / float(gray_frame.size)
         is_black = mean_intensity < self.black_thresh
         return is_black, mean_intensity
\ No newline at end of file
@@ -3,6 +3,22 @@ import numpy as np
 from shapely.geometry import Polygon, LineString
 # import seaborn as sns
 
+_TEXT_SIZE_CACHE = {}
+_TEXT_SIZE_CACHE_MAX = 4096
+
+
+def _text_size(text, font, font_scale, thickness):
+    """cv2.getTextSize(...)[0], memoized; labels are mostly the same from frame to frame"""
+    key = (text, font, font_scale, thickness)
+    size = _TEXT_SIZE_CACHE.get(key)
+    if size is None:
+        size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+        if len(_TEXT_SIZE_CACHE) >= _TEXT_SIZE_CACHE_MAX:
+            # FIFO eviction: dicts keep insertion order
+            del _TEXT_SIZE_CACHE[next(iter(_TEXT_SIZE_CACHE))]
+        _TEXT_SIZE_CACHE[key] = size
+    return size
+
 
 def plot_dict(frame, info_dict, starting_point='top_right'):
     # Define padding and initial position
@@ -19,7 +35,7 @@ def plot_dict(frame, info_dict, starting_point='top_right'):
     max_label_width = 0
     text_height = 0
     for label, count in info_dict.items():
-        text_size = cv2.getTextSize(f'{label}: {count}', font, font_scale, font_thickness)[0]
+        text_size = _text_size(f'{label}: {count}', font, font_scale, font_thickness)
         max_label_width = max(max_label_width, text_size[0])
         text_height = text_size[1]
 
@@ -64,70 +80,110 @@ def plot_dict(frame, info_dict, starting_point='top_right'):
     return frame
 
 
-def plot_shapes(frame, shapes, color_polygon=(139, 42, 242), color_line=(139, 42, 242), thickness=2, center_text=True, alpha=0.6):
+def prepare_shape(shape_name, shape_info):
     """
-    Plot multiple polygons and lines on the given frame.
+    Precompute the drawing data of a zone entry and store it on the entry itself:
+    _shape_kind ("polygon"/"line"), _cv_pts (int32 Nx1x2), _centroid_xy (label anchor)
+    and _text_size. Zones are static, so this runs once per zone (e.g. from
+    ZoneManager.set_zones) instead of once per frame.
+    Returns False for entries that cannot be drawn.
     """
-    # Ensure frame has 3 channels
-    if len(frame.shape) == 2:
-        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-
-    for shape_name, shape_info in shapes.items():
-        if not isinstance(shape_info, dict) or "shape" not in shape_info:
-            continue  # Skip invalid entries
-
-        shape = shape_info["shape"]
-        shape_type = shape_info.get("type", "unknown")
+    shape = shape_info["shape"]
+
+    if isinstance(shape, Polygon):
+        if shape.exterior is None:
+            print(f"Skipping {shape_name}, invalid Polygon.")
+            return False
+        coords = np.asarray(shape.exterior.coords)
+        centroid = shape.centroid
+        shape_info["_shape_kind"] = "polygon"
+        shape_info["_centroid_xy"] = (centroid.x, centroid.y)
+    elif isinstance(shape, LineString):
+        coords = np.asarray(shape.coords)
+        mid = coords.mean(axis=0)
+        shape_info["_shape_kind"] = "line"
+        shape_info["_centroid_xy"] = (int(mid[0]), int(mid[1]))
+    else:
+        print(f"Skipping {shape_name}, unsupported shape type: {type(shape)}")
+        return False
 
-        if isinstance(shape, Polygon):
-            if shape.exterior is None:
-                print(f"Skipping {shape_name}, invalid Polygon.")
-                continue
+    shape_info["_cv_pts"] = coords[:, :2].astype(np.int32).reshape((-1, 1, 2))
+    shape_info["_text_size"] = _text_size(shape_name, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)
+    shape_info["_prepared_shape"] = shape
+    return True
 
-            x, y = shape.exterior.xy
-            polygon_vertices = np.array(list(zip(x, y)), dtype=np.int32).reshape((-1, 1, 2))
 
-            # print(f"Drawing Polygon: {shape_name}, Points: {polygon_vertices}")
+class ShapeArrays:
+    """
+    Struct-of-arrays view of a zone dict for plot_shapes: vertex arrays, label names and
+    label origins (K,2 int32) for polygons and lines. Build once when zones are set
+    with prepare_shapes() and pass it to plot_shapes on every frame.
+    """
 
-            # Draw the polygon outline
-            overlay = frame.copy()
-            cv2.polylines(overlay, [polygon_vertices], isClosed=True, color=color_polygon, thickness=thickness)
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    def __init__(self, shapes):
+        self.source = shapes
+        self.poly_pts, self.poly_names, poly_org = [], [], []
+        self.line_pts, self.line_names, line_org = [], [], []
 
-            # Draw text at the centroid
-            if center_text:
-                centroid = shape.centroid
-                text_size = cv2.getTextSize(shape_name, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
-                text_position = (int(centroid.x - text_size[0] / 2), int(centroid.y + text_size[1] / 2))
+        for shape_name, shape_info in shapes.items():
+            if not isinstance(shape_info, dict) or "shape" not in shape_info:
+                continue  # Skip invalid entries
+            if shape_info.get("_prepared_shape") is not shape_info["shape"]:
+                if not prepare_shape(shape_name, shape_info):
+                    continue
 
-                overlay = frame.copy()
-                cv2.putText(overlay, shape_name, text_position, cv2.FONT_HERSHEY_SIMPLEX, 1, color_polygon, thickness=2)
-                cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+            cx, cy = shape_info["_centroid_xy"]
+            text_w, text_h = shape_info["_text_size"]
+            if shape_info["_shape_kind"] == "polygon":
+                self.poly_pts.append(shape_info["_cv_pts"])
+                self.poly_names.append(shape_name)
+                # Text at the centroid
+                poly_org.append((int(cx - text_w / 2), int(cy + text_h / 2)))
+            else:
+                self.line_pts.append(shape_info["_cv_pts"])
+                self.line_names.append(shape_name)
+                # Text at midpoint
+                line_org.append((cx - text_w // 2, cy + text_h // 2))
 
-        elif isinstance(shape, LineString):
-            x, y = shape.xy
-            line_vertices = np.array(list(zip(x, y)), dtype=np.int32).reshape((-1, 1, 2))
+        self.poly_text_org = np.array(poly_org, dtype=np.int32).reshape(-1, 2)
+        self.line_text_org = np.array(line_org, dtype=np.int32).reshape(-1, 2)
 
-            # print(f"Drawing Line: {shape_name}, Points: {line_vertices}")
+    def __len__(self):
+        return len(self.poly_pts) + len(self.line_pts)
 
-            overlay = frame.copy()
-            cv2.polylines(overlay, [line_vertices], isClosed=False, color=color_line, thickness=thickness)
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
 
-            # Draw text at midpoint
-            if center_text:
-                mid_x = int(np.mean(x))
-                mid_y = int(np.mean(y))
+def prepare_shapes(shapes):
+    return ShapeArrays(shapes)
 
-                text_size = cv2.getTextSize(shape_name, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
-                text_position = (mid_x - text_size[0] // 2, mid_y + text_size[1] // 2)
 
-                overlay = frame.copy()
-                cv2.putText(overlay, shape_name, text_position, cv2.FONT_HERSHEY_SIMPLEX, 1, color_line, thickness=2)
-                cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+def plot_shapes(frame, shapes, color_polygon=(139, 42, 242), color_line=(139, 42, 242), thickness=2, center_text=True, alpha=0.6, arrays=None):
+    """
+    Plot multiple polygons and lines on the given frame.
+    All shapes and labels are drawn on a single overlay which is blended into the frame once.
+    :param arrays: ShapeArrays built by prepare_shapes(shapes); built on the fly when omitted.
+    """
+    # Ensure frame has 3 channels
+    if len(frame.shape) == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
 
-        else:
-            print(f"Skipping {shape_name}, unsupported shape type: {type(shape)}")
+    if arrays is None or arrays.source is not shapes:
+        arrays = ShapeArrays(shapes)
+    if not len(arrays):
+        return frame
+
+    overlay = frame.copy()
+    if arrays.poly_pts:
+        cv2.polylines(overlay, arrays.poly_pts, isClosed=True, color=color_polygon, thickness=thickness)
+    if arrays.line_pts:
+        cv2.polylines(overlay, arrays.line_pts, isClosed=False, color=color_line, thickness=thickness)
+    if center_text:
+        for i, name in enumerate(arrays.poly_names):
+            x, y = arrays.poly_text_org[i]
+            cv2.putText(overlay, name, (int(x), int(y)), cv2.FONT_HERSHEY_SIMPLEX, 1, color_polygon, thickness=2)
+        for i, name in enumerate(arrays.line_names):
+            x, y = arrays.line_text_org[i]
+            cv2.putText(overlay, name, (int(x), int(y)), cv2.FONT_HERSHEY_SIMPLEX, 1, color_line, thickness=2)
+    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
 
     return frame
 
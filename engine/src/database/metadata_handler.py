@@ -1,147 +1,349 @@
-import queue
+import operator
 import threading
-import time
+import bson
+from dataclasses import dataclass
+from datetime import datetime
 import numpy as np
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import WriteConcern
 from src.database.schemas.metadata_schema import Metadata
 
-class MetadataHandler:
+# All per-track fields in one C call; tracks missing any of them take the .get() fallback
+_TRACK_GET = operator.itemgetter("track_id", "bbox", "confidence", "label_id", "label_name", "instance_dict")
+
+
+def _format_tracks(raw_tracks):
     """
-    A High-Performance Database Writer.
-    It decouples the Engine's main loop from MongoDB by using a 
-    background thread and batch inserts.
+    Formats all tracks of a frame at once: fields are gathered per track, then bboxes,
+    confidences and labels are each converted with a single numpy cast + tolist()
+    (native Python numbers, built in C) instead of per-value int()/float() calls.
+    """
+    keys, fields = [], []
+    for track_key, details in raw_tracks.items():
+        try:
+            fields.append(_TRACK_GET(details))
+        except KeyError:
+            get = details.get
+            fields.append((
+                get("track_id"), get("bbox", ()), get("confidence", 0.0),
+                get("label_id", 0), get("label_name", "unknown"), get("instance_dict", {})
+            ))
+        keys.append(track_key)
+    if not fields:
+        return {}
+
+    # Column-wise (one sequence per field) from here on; documents are only assembled at the end.
+    # Batching columns across frames doesn't pay off: each record is BSON-encoded in process().
+    tids, bboxes, confs, lids, lnames, insts = zip(*fields)
+    try:
+        bboxes = np.asarray(bboxes, dtype=np.int32).tolist()
+    except ValueError:
+        # Ragged (e.g. a missing bbox): fall back to one cast per track
+        bboxes = [np.asarray(b, dtype=np.int32).tolist() for b in bboxes]
+    confs = np.asarray(confs, dtype=np.float64).tolist()
+    lids = np.asarray(lids, dtype=np.int64).tolist()
+
+    return {
+        str(key): {
+            "track_id": str(tid),
+            "bbox": bbox,
+            "confidence": conf,
+            "label": lid, # Ensure keys match Predictor output
+            "label_name": lname,
+            "instance_dict": inst
+        }
+        for key, tid, bbox, conf, lid, lname, inst in zip(keys, tids, bboxes, confs, lids, lnames, insts)
+    }
+
+
+@dataclass(slots=True)
+class QueuedItem:
+    """One frame's record between process() and encoding. Reused, it never leaves process()."""
+    frame_number: int = 0
+    time_stamp: datetime = None
+    tracks: dict = None
+    raw_frame_path: str = ""
+    plotted_frame_path: str = ""
+    inference_time: float = 0.0
+
+class MetadataWriter:
+    """
+    Process-wide background writer shared by every MetadataHandler.
+    All cameras queue their encoded records on one deque, and one thread
+    issues a single insert_many per tick regardless of the camera count.
+    Created lazily by the first handler and stopped when the last one closes.
     """
 
+    _instance = None
+    _instance_lock = threading.Lock()
+
     def __init__(self, config, logger):
         self.logger = logger
         self.batch_size = config.get('buffer_size', 100) # Default to 100 frames
         self.flush_interval = config.get('flush_interval', 5) # Seconds
-        
-        # Metadata needs to know which device this data belongs to.
-        # The Engine injects 'deviceName' or IDs into the config at runtime.
-        self.device_id = config.get('device_id') # If you store ObjectIds
-        self.device_name = config.get('deviceName', 'unknown') 
+
+        # Adaptive flushing: queue depth after each flush picks a load level, which scales the
+        # batch size and flush interval from the configured base values. A level change needs
+        # up_steps / down_steps consecutive samples so the writer doesn't oscillate.
+        self.base_batch_size = self.batch_size
+        self.base_flush_interval = self.flush_interval
+        self.min_interval = config.get('min_flush_interval', 0.5)
+        self.max_interval = config.get('max_flush_interval', 2 * self.flush_interval)
+        self.up_steps = config.get('flush_up_steps', 2)
+        self.down_steps = config.get('flush_down_steps', 5)
+
+        # ack=False trades per-record durability for not waiting on the primary:
+        # inserts go out with w=0 and return once the socket write completes
+        self.ack = config.get('ack', True)
+        self._collection = None
+
+        # Inserts run on a small thread pool so a slow round-trip doesn't hold up the next batch.
+        # Encoding already happened in process(), so what's left is socket I/O, which releases the GIL.
+        self.flush_workers = config.get('flush_workers', 2)
+        self._flush_pool = ThreadPoolExecutor(max_workers=self.flush_workers, thread_name_prefix="metadata-flush")
+        self._inflight = deque()
+        self._level = 1
+        self._pending_level = 1
+        self._level_count = 0
 
         # Threading Setup
-        self.data_queue = queue.Queue()
+        # deque.append is atomic, so producers only take the condition lock
+        # to wake the worker once half a batch is waiting.
+        # Bounded: if Mongo stalls the oldest records are dropped instead of growing RAM or blocking producers.
+        self.data_queue = deque(maxlen=config.get('max_queue', 4 * self.batch_size))
+        self.dropped = 0
+        self._cv = threading.Condition()
+        self._notify_at = max(1, self.batch_size // 2)
+        self._refs = 0
         self.stop_event = threading.Event()
         self.worker_thread = threading.Thread(target=self._batch_worker, daemon=True)
         self.worker_thread.start()
-        
+
         self.logger.info(f"Metadata Batch Writer started (Batch: {self.batch_size}, Interval: {self.flush_interval}s)")
 
-    def process(self, payload):
-        """
-        Standard Interface for Dynamic Engine.
-        Pushes data to the queue and returns payload immediately (Non-blocking).
-        """
-        # We only want to queue if there's actual data or if you want a record for every frame.
-        # Usually, we check if detections exist to save space.
-        track_info = payload['meta'].get('track_ids_info')
-        
-        if track_info:
-            # Create a lightweight dict to send to the worker
-            # We don't want to send the full 'frame' (numpy array) to the queue to save RAM
-            item = {
-                "frame_number": payload['frame_number'],
-                "time_stamp": payload['timestamp'],
-                "track_ids_info": track_info,
-                # Retrieve paths if FrameHandler set them
-                "raw_frame_path": payload['meta'].get('raw_frame_path', ""),
-                "plotted_frame_path": payload['meta'].get('plotted_frame_path', ""),
-                "inference_time": payload['meta'].get('inference_time', 0.0)
-            }
-            
-            try:
-                self.data_queue.put(item)
-            except Exception as e:
-                self.logger.error(f"Failed to queue metadata: {e}")
+    @classmethod
+    def acquire(cls, config, logger):
+        """Returns the shared writer, starting it on first use. The first caller's config sets the batching."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config, logger)
+            cls._instance._refs += 1
+            return cls._instance
 
-        return payload
+    def release(self):
+        """Drops one handler's reference; the last one flushes and stops the writer."""
+        with self._instance_lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            if MetadataWriter._instance is self:
+                MetadataWriter._instance = None
+        self.stop_event.set()
+        with self._cv:
+            self._cv.notify()
+        self.worker_thread.join(timeout=5)
+        self.logger.info("Metadata Batch Writer stopped.")
+
+    def put(self, raw):
+        if len(self.data_queue) == self.data_queue.maxlen:
+            self.dropped += 1 # append below evicts the oldest record
+        was_empty = not self.data_queue
+        self.data_queue.append(raw)
+        # Wake the worker on the first record (it sleeps untimed while idle) and at half a batch
+        if was_empty or len(self.data_queue) >= self._notify_at:
+            with self._cv:
+                self._cv.notify()
 
     def _batch_worker(self):
         """
         Background thread loop.
         """
         buffer = []
-        last_flush_time = time.time()
 
         while not self.stop_event.is_set():
             try:
-                # Wait for data (1 sec timeout to allow checking stop_event)
-                try:
-                    item = self.data_queue.get(timeout=1)
-                    
-                    # Convert dict to Mongo Document Object
-                    mongo_obj = self._format_metadata(item)
-                    if mongo_obj:
-                        buffer.append(mongo_obj)
-                        
-                except queue.Empty:
-                    pass
-
-                # Check flush conditions
-                time_since_flush = time.time() - last_flush_time
-                is_buffer_full = len(buffer) >= self.batch_size
-                is_time_up = time_since_flush >= self.flush_interval
-
-                if buffer and (is_buffer_full or is_time_up):
-                    self._flush_to_db(buffer)
+                with self._cv:
+                    # Idle: no timeout, an empty writer sleeps until a record arrives or release() stops it
+                    self._cv.wait_for(lambda: self.data_queue or self.stop_event.is_set())
+                    # Then block once per batch: until half a batch is waiting, stop, or flush_interval
+                    # after the first record (wait_for keeps its own monotonic deadline across wake-ups)
+                    self._cv.wait_for(
+                        lambda: len(self.data_queue) >= self._notify_at or self.stop_event.is_set(),
+                        timeout=self.flush_interval
+                    )
+
+                # Drain what is there in one go, up to a full batch, then flush
+                while self.data_queue and len(buffer) < self.batch_size:
+                    # Already encoded in process(); the driver writes the bytes as they are
+                    buffer.append(RawBSONDocument(self.data_queue.popleft()))
+
+                if buffer:
+                    self._submit_flush(buffer)
                     buffer = [] # Clear buffer
-                    last_flush_time = time.time()
+                    self._adapt_flush()
 
             except Exception as e:
                 self.logger.error(f"Error in Metadata worker: {e}")
 
         # Final flush on exit
+        while self.data_queue:
+            buffer.append(RawBSONDocument(self.data_queue.popleft()))
         if buffer:
-            self._flush_to_db(buffer)
+            self._submit_flush(buffer)
+        self._flush_pool.shutdown(wait=True)
+
+    def _submit_flush(self, buffer):
+        """Hands a batch to the flush pool; with too many batches in flight, waits for the oldest."""
+        while self._inflight and self._inflight[0].done():
+            self._inflight.popleft()
+        if len(self._inflight) >= 2 * self.flush_workers:
+            self._inflight.popleft().result()
+        self._inflight.append(self._flush_pool.submit(self._flush_to_db, buffer))
+
+    # Load level -> (batch multiplier, interval multiplier).
+    # Idle flushes sooner for fresher data; bursts get bigger batches and fewer round-trips.
+    _LEVELS = {0: (1.0, 0.5), 1: (1.0, 1.0), 2: (1.5, 0.75), 3: (2.0, 0.5)}
+
+    def _adapt_flush(self):
+        """
+        Re-tunes batch_size and flush_interval from the queue depth left after a flush.
+        """
+        pressure = len(self.data_queue) / self.base_batch_size
+        if pressure < 0.25:
+            level = 0
+        elif pressure < 1:
+            level = 1
+        elif pressure < 2:
+            level = 2
+        else:
+            level = 3
+
+        if level == self._level:
+            self._level_count = 0
+            return
+        if level != self._pending_level:
+            self._pending_level = level
+            self._level_count = 0
+        self._level_count += 1
+        if self._level_count < (self.up_steps if level > self._level else self.down_steps):
+            return
+
+        self._level = level
+        self._level_count = 0
+        batch_mult, interval_mult = self._LEVELS[level]
+        self.batch_size = max(1, min(int(self.base_batch_size * batch_mult), 4 * self.base_batch_size))
+        self.flush_interval = min(max(self.base_flush_interval * interval_mult, self.min_interval), self.max_interval)
+        self._notify_at = max(1, self.batch_size // 2)
+        self.logger.debug(
+            f"Metadata flush level {level}: batch {self.batch_size}, interval {self.flush_interval:.2f}s"
+        )
 
     def _flush_to_db(self, buffer):
         """
         Performs the Bulk Insert.
         """
         try:
-            # Metadata.objects.insert is a MongoEngine method
-            # load_bulk=False prevents it from trying to reload the objects back from DB
-            Metadata.objects.insert(buffer, load_bulk=False)
+            # Straight to PyMongo: no Document construction or per-field validation.
+            # The Metadata class only declares the collection and its indexes.
+            if self._collection is None:
+                collection = Metadata._get_collection()
+                if not self.ack:
+                    collection = collection.with_options(write_concern=WriteConcern(w=0))
+                self._collection = collection
+            # bypass_document_validation is rejected on unacknowledged writes
+            self._collection.insert_many(buffer, ordered=False, bypass_document_validation=self.ack)
             self.logger.debug(f"✅ Flushed {len(buffer)} records.")
+            if self.dropped:
+                self.logger.warning(f"Metadata queue full, dropped {self.dropped} oldest records since last flush")
+                self.dropped = 0
         except Exception as e:
             self.logger.error(f"Database batch insert error: {e}")
 
+
+class MetadataHandler:
+    """
+    A High-Performance Database Writer.
+    It decouples the Engine's main loop from MongoDB: records are formatted and
+    encoded here, then batch-inserted by the shared MetadataWriter thread.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+
+        # Metadata needs to know which device this data belongs to.
+        # The Engine injects 'deviceName' or IDs into the config at runtime.
+        self.device_id = config.get('device_id') # If you store ObjectIds
+        self.device_name = config.get('deviceName', 'unknown') 
+
+        self.writer = MetadataWriter.acquire(config, logger)
+        self._item = QueuedItem()
+
+    def process(self, payload):
+        """
+        Standard Interface for Dynamic Engine.
+        Pushes data to the queue and returns payload immediately (Non-blocking).
+        """
+        # We only want to queue if there's actual data or if you want a record for every frame.
+        # Usually, we check if detections exist to save space. Most frames have none, so that
+        # path is kept to one lookup.
+        meta = payload.meta
+        track_info = meta.get('track_ids_info')
+        if not track_info:
+            return payload
+
+        # Fill the reusable record and queue it as encoded BSON; the writer only wraps and inserts.
+        # We don't want to send the full 'frame' (numpy array) to the queue to save RAM
+        item = self._item
+        item.frame_number = payload.frame_number
+        item.time_stamp = payload.datetime_utc
+        item.tracks = track_info
+        # Retrieve paths if FrameHandler set them
+        item.raw_frame_path = meta.get('raw_frame_path', "")
+        item.plotted_frame_path = meta.get('plotted_frame_path', "")
+        item.inference_time = meta.get('inference_time', 0.0)
+
+        raw = self._encode(item)
+        if raw is not None:
+            self.writer.put(raw)
+
+        return payload
+
+    def _encode(self, item):
+        """
+        Formats an item and encodes it to BSON once, on the producer thread.
+        The _id is set here because the driver cannot add one to a RawBSONDocument.
+        """
+        doc = self._format_metadata(item)
+        if doc is None:
+            return None
+        doc["_id"] = ObjectId()
+        try:
+            return bson.encode(doc)
+        except Exception as e:
+            self.logger.error(f"Metadata encoding error: {e}")
+            return None
+
     def _format_metadata(self, item):
         """
-        Transforms the raw item dict into the Metadata Schema object.
+        Transforms the QueuedItem into a document shaped like the Metadata schema
+        (keys are the schema's field names), ready for insert_many.
         """
         try:
             # Sanitize track info (convert numpy types to python native)
-            formatted_tracks = {}
-            raw_tracks = item.get("track_ids_info", {})
-            
-            for track_key, details in raw_tracks.items():
-                # Handle bbox (numpy array -> list)
-                bbox = details.get("bbox", [])
-                if isinstance(bbox, np.ndarray):
-                    bbox = bbox.tolist()
-                bbox = [int(x) for x in bbox]
-
-                formatted_tracks[str(track_key)] = {
-                    "track_id": str(details.get("track_id")),
-                    "bbox": bbox,
-                    "confidence": float(details.get("confidence", 0.0)),
-                    "label": int(details.get("label_id", 0)), # Ensure keys match Predictor output
-                    "label_name": details.get("label_name", "unknown"),
-                    "instance_dict": details.get("instance_dict", {})
-                }
-
-            return Metadata(
-                frame_number=item["frame_number"],
-                time_stamp=item["time_stamp"],
-                raw_frame_path=item["raw_frame_path"],
-                plotted_frame_path=item["plotted_frame_path"],
-                device=self.device_id if self.device_id else self.device_name, # Use ID if available, else Name
-                inference_time=float(item["inference_time"]),
-                track_ids_info=formatted_tracks
-            )
+            formatted_tracks = _format_tracks(item.tracks or {})
+
+            return {
+                "frame_number": int(item.frame_number),
+                "time_stamp": item.time_stamp,
+                "raw_frame_path": item.raw_frame_path,
+                "plotted_frame_path": item.plotted_frame_path,
+                "device_name": self.device_id if self.device_id else self.device_name, # Use ID if available, else Name
+                "inference_time": float(item.inference_time),
+                "track_ids_info": formatted_tracks
+            }
         except Exception as e:
             self.logger.error(f"Metadata formatting error: {e}")
             return None
@@ -151,6 +353,5 @@ class MetadataHandler:
         Called by Engine.cleanup()
         """
         self.logger.info("Stopping Metadata Handler...")
-        self.stop_event.set()
-        self.worker_thread.join(timeout=5)
-        self.logger.info("Metadata Handler stopped.")
\ No newline at end of file
+        self.writer.release()
+        self.logger.info("Metadata Handler stopped.")
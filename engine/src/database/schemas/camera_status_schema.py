@@ -1,11 +1,11 @@
 import mongoengine as db
-import datetime
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField, ReferenceField, BooleanField, LongField, ObjectIdField
+from src.database.schemas.utils import utcnow
 
 
 class CameraStatus(Document):
     device_name = StringField(required=True)
-    timestamp = DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    timestamp = DateTimeField(default=utcnow)
     connection = BooleanField(required=True)  # True = Connected, False = Disconnected
     frame_corruption = BooleanField(required=True)  # True = Corrupted, False = OK
 
@@ -1,6 +1,6 @@
 import mongoengine as db
-import datetime
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField, ReferenceField, BooleanField, LongField, ObjectIdField
+from src.database.schemas.utils import utcnow
 
 
 class Cameras(db.Document):
@@ -19,8 +19,8 @@ class Cameras(db.Document):
     department = db.StringField()
     frame = db.StringField()
 
-    created_at = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
-    updated_at = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = db.DateTimeField(default=utcnow)
+    updated_at = db.DateTimeField(default=utcnow)
     meta = {
         'collection': 'cameras'
     }
@@ -1,11 +1,17 @@
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField  
 
 class Metadata(Document):
+    # Written by MetadataHandler as pre-encoded BSON through the raw collection
+    # (insert_many with bypass_document_validation); the field types below are
+    # enforced by MetadataHandler._format_metadata, not by Document validation.
     # Basic Video and Frame Info
     frame_number = IntField(required=True)
     time_stamp = DateTimeField(required=True)
     raw_frame_path = StringField(required=True)
     plotted_frame_path = StringField(required=False)
+    evidence_frame_number = StringField()
+    video_path = StringField(required=False)
+    evidence_path = StringField(required=False)
     device_name = StringField(required=True)
     inference_time = FloatField()
     track_ids_info = DictField(
@@ -23,7 +29,7 @@ class Metadata(Document):
     )
     meta = {
         'collection': 'metadata',
-        'indexes': ['time_stamp']
+        'indexes': ['time_stamp', ('device_name', '-time_stamp')]
     }
 
     
\ No newline at end of file
@@ -1,6 +1,6 @@
 import mongoengine as db
-import datetime
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField, ReferenceField, BooleanField, LongField, ObjectIdField
+from src.database.schemas.utils import utcnow
 
 
 class Services(db.Document):
@@ -9,7 +9,8 @@ class Services(db.Document):
     pipeline_path = db.StringField(required=True)
     fixed_zones = db.BooleanField(default=False)
     # default = db.ListField(db.StringField()) 
-    created_at = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    zones = db.ListField(db.ReferenceField('Zones'))
+    created_at = db.DateTimeField(default=utcnow)
     
     
 class DefaultServices(db.Document):
@@ -18,6 +19,6 @@ class DefaultServices(db.Document):
     pipeline_path = db.StringField(required=True)
     fixed_zones = db.BooleanField(default=False)
     zones = db.ListField(db.ReferenceField('Zones'))   
-    created_at = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = db.DateTimeField(default=utcnow)
 
   
\ No newline at end of file
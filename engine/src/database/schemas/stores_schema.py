@@ -1,6 +1,7 @@
 import mongoengine as db
-import datetime
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField, ReferenceField, BooleanField, LongField, ObjectIdField
+from src.database.schemas.utils import utcnow
+
 
 class Stores(db.Document):
     store_id = db.StringField()
@@ -14,5 +15,5 @@ class Stores(db.Document):
     district = db.StringField()
     location = db.DictField()
     layout = db.DictField()
-    createdAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
-    updatedAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    createdAt = db.DateTimeField(default=utcnow)
+    updatedAt = db.DateTimeField(default=utcnow)
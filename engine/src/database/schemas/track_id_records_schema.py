@@ -5,7 +5,7 @@ from mongoengine import Document, IntField, DateTimeField, StringField, DictFiel
 
 class TrackIDRecord(Document):
     track_id = StringField(required=True) 
-    camera = ReferenceField(Cameras, required=True) 
+    camera = ReferenceField('Cameras', required=True) 
     videos = ListField(StringField())
     track_id_path_lists = ListField(ListField(StringField())) 
     model_name = StringField(required=True) 
@@ -0,0 +1,6 @@
+import datetime
+
+
+def utcnow():
+    """Timezone-aware UTC now; used as the callable default of the schemas' timestamp fields."""
+    return datetime.datetime.now(datetime.timezone.utc)
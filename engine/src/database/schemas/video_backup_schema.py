@@ -1,10 +1,7 @@
 import mongoengine as me
-import datetime as dt
+from src.database.schemas.utils import utcnow
 
 
-def utcnow():
-    return dt.datetime.now(dt.timezone.utc)
-
 class VideoBackup(me.Document):
     meta = {
         "collection": "video_backup",
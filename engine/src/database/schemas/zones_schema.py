@@ -1,6 +1,7 @@
 import mongoengine as db
-import datetime
 from mongoengine import Document, IntField, DateTimeField, StringField, DictField, FloatField, ListField, ReferenceField, BooleanField, LongField, ObjectIdField
+from src.database.schemas.utils import utcnow
+
 
 class Zones(db.Document):
     zone_id = db.StringField(required=True, unique=True) 
@@ -9,8 +10,8 @@ class Zones(db.Document):
     store = db.ReferenceField('Stores')  
     colourHex = db.StringField(default="#09467c")  
     roi = db.ListField(db.ListField(db.FloatField())) 
-    createdAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
-    updatedAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    createdAt = db.DateTimeField(default=utcnow)
+    updatedAt = db.DateTimeField(default=utcnow)
 
     meta = {
         'indexes': [
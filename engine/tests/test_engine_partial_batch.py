@@ -0,0 +1,44 @@
+"""
+The detector exports its TensorRT engine with the batch size as the profile maximum
+(Detector._export_engine). Partial batches (batch_max_wait flush, final flush,
+single-frame predict) must run on it instead of failing the static input-shape check.
+
+Needs a CUDA device and TensorRT; skipped otherwise.
+"""
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("tensorrt")
+ultralytics = pytest.importorskip("ultralytics")
+
+pytestmark = pytest.mark.skipif(not torch.cuda.is_available(), reason="TensorRT engines need a CUDA device")
+
+BATCH = 4
+IMGSZ = 320
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    # Same export arguments as Detector._export_engine for batch > 1
+    # The weights are downloaded to, and the engine written to, the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("engine"))
+    try:
+        exported = ultralytics.YOLO("yolov8n.pt").export(
+            format='engine', half=True, dynamic=True, imgsz=IMGSZ,
+            batch=BATCH, workspace=2, device=0
+        )
+        exported = os.path.abspath(exported)
+    finally:
+        os.chdir(cwd)
+    return ultralytics.YOLO(exported, task='detect')
+
+
+@pytest.mark.parametrize("n", [1, BATCH - 1, BATCH])
+def test_partial_batch(engine, n):
+    frames = [np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8) for _ in range(n)]
+    results = engine.predict(source=frames, imgsz=IMGSZ, half=True, device=0, verbose=False)
+    assert len(results) == n
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from kubernetes.client.rest import ApiException
 
@@ -15,7 +17,7 @@ router = APIRouter(
 
 
 @router.post("/", status_code=201)
-def create_new_camera(camera_request: CameraCreateRequest):
+async def create_new_camera(camera_request: CameraCreateRequest):
     """
     Adds a new camera to the system.
     
@@ -24,20 +26,37 @@ def create_new_camera(camera_request: CameraCreateRequest):
     2. A batch-processing CronJob.
     """
     try:
-        # 1. Create the real-time Deployment
-        deployment_result = k8s_manager.create_camera_deployment(
-            camera_id=camera_request.camera_id,
-            rtsp_url=camera_request.rtsp_url
-        )
-
-        # 2. Create the batch processing CronJob
         # We'll use a hardcoded service_id for this example
         service_id = "your-batch-service-id"  # You'd probably get this from the request
-        
-        cronjob_result = k8s_manager.create_camera_cronjob(
-            camera_id=camera_request.camera_id,
-            service_id=service_id
+
+        # 1. + 2. Create the real-time Deployment and the batch processing CronJob.
+        # The k8s client is blocking, so each call runs in a worker thread and both go out at once.
+        deployment_result, cronjob_result = await asyncio.gather(
+            asyncio.to_thread(
+                k8s_manager.create_camera_deployment,
+                camera_id=camera_request.camera_id,
+                rtsp_url=camera_request.rtsp_url
+            ),
+            asyncio.to_thread(
+                k8s_manager.create_camera_cronjob,
+                camera_id=camera_request.camera_id,
+                service_id=service_id
+            ),
+            return_exceptions=True
         )
+        # Let both calls finish. If only one failed, remove the one that was created
+        # (by name: a label delete could hit resources that existed before, e.g. on a 409),
+        # then surface the failure through the handlers below.
+        deployment_failed = isinstance(deployment_result, BaseException)
+        cronjob_failed = isinstance(cronjob_result, BaseException)
+        if deployment_failed != cronjob_failed:
+            await _rollback(
+                None if deployment_failed else deployment_result,
+                None if cronjob_failed else cronjob_result
+            )
+        for result in (deployment_result, cronjob_result):
+            if isinstance(result, BaseException):
+                raise result
 
         # 3. Return a success response
         return {
@@ -54,13 +73,6 @@ def create_new_camera(camera_request: CameraCreateRequest):
             status_code=e.status, 
             detail=f"Failed to create Kubernetes resource. Reason: {e.reason}"
         )
-    except FileNotFoundError as e:
-        # If the .yaml templates are missing
-        print(f"Error: Missing template file: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Server configuration error: Missing Kubernetes template."
-        )
     except Exception as e:
         # Catchall for other unexpected errors
         print(f"An unexpected error occurred: {e}")
@@ -70,18 +82,32 @@ def create_new_camera(camera_request: CameraCreateRequest):
         )
 
 
+async def _rollback(deployment_result, cronjob_result):
+    """Deletes whichever resource of a half-created camera was created."""
+    try:
+        if deployment_result is not None:
+            await asyncio.to_thread(
+                k8s_manager.delete_camera_deployment,
+                name=deployment_result["metadata"]["name"]
+            )
+        if cronjob_result is not None:
+            await asyncio.to_thread(
+                k8s_manager.delete_camera_cronjob,
+                name=cronjob_result["metadata"]["name"]
+            )
+    except Exception as e:
+        # The original error is what the client needs to see; this one is only logged
+        print(f"Rollback of partially created camera failed: {e}")
+
+
 @router.delete("/{camera_id}", status_code=200)
-def delete_camera(camera_id: str):
+async def delete_camera(camera_id: str):
     """
     Deletes a camera and all its associated Kubernetes resources.
     """
     try:
-        k8s_manager.delete_camera_resources(camera_id=camera_id)
-        
-        return {
-            "message": f"Successfully deleted all resources for camera_id: {camera_id}"
-        }
-        
+        # Deletes every resource kind in parallel inside k8s_manager
+        result = await asyncio.to_thread(k8s_manager.delete_camera_resources, camera_id=camera_id)
     except ApiException as e:
         print(f"Kubernetes API Error: {e.status} - {e.reason}")
         raise HTTPException(
@@ -93,4 +119,17 @@ def delete_camera(camera_id: str):
         raise HTTPException(
             status_code=500, 
             detail=f"An unexpected server error occurred: {e}"
-        )
\ No newline at end of file
+        )
+
+    # A partial delete is a failure: the client has to retry (deletes are idempotent)
+    if result["errors"]:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": f"Some resources for camera_id: {camera_id} could not be deleted",
+                "errors": result["errors"]
+            }
+        )
+    return {
+        "message": f"Successfully deleted all resources for camera_id: {camera_id}"
+    }
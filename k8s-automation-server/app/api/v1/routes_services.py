@@ -1,25 +1,32 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from core import k8s_manager  # Import your manager
+from pydantic import BaseModel, ConfigDict
+from app.core import k8s_manager  # Import your manager
 
 router = APIRouter()
 
 class ServiceSubscription(BaseModel):
+    # Validated by pydantic-core; unknown fields are rejected instead of silently dropped
+    model_config = ConfigDict(str_strip_whitespace=True, extra='forbid')
+
     service_name: str
     image_name: str # e.g., "my-repo/warehouse-aggregator:v1"
     service_id: str   # e.g., the ObjectId of the service in your DB
     schedule: str = "*/1 * * * *"
 
 @router.post("/subscribe")
-def subscribe_service(sub: ServiceSubscription):
+async def subscribe_service(sub: ServiceSubscription):
     """
     Subscribes a new service, which creates its
     necessary CronJobs on the cluster.
     """
     print(f"Received subscription request for: {sub.service_name}")
     
-    # Call your manager to do the real work
-    cronjob_name = k8s_manager.create_cronjob(
+    # Call your manager to do the real work.
+    # The k8s client blocks, so it runs in a worker thread and the event loop stays free.
+    cronjob_name = await asyncio.to_thread(
+        k8s_manager.create_cronjob,
         service_name=sub.service_name,
         image_name=sub.image_name,
         service_id=sub.service_id,
@@ -1,21 +1,19 @@
+"""
+Creates and deletes the per-camera Kubernetes resources, built as typed client models.
+
+Client-side throttling: unlike client-go, the Python kubernetes client has no QPS/burst
+rate limiter, so nothing here serializes bursts of creates/deletes. The only in-process
+cap is the shared connection pool, which bounds how many requests are in flight at once:
+  K8S_BURST    max concurrent apiserver connections (default max(32, 5 * CPUs))
+  K8S_RETRIES  urllib3 retries on connection errors (default 3)
+"""
 import os
-import yaml
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 
-# --- Setup: Find Template Directory ---
-# This line finds the root directory of your project (k8s-automation-server)
-# It assumes k8s_manager.py is in k8s-automation-server/app/core/
-try:
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    TEMPLATE_DIR = os.path.join(BASE_DIR, "kubernetes_templates")
-    if not os.path.exists(TEMPLATE_DIR):
-        raise FileNotFoundError("Template directory not found")
-except Exception:
-    # Fallback for different execution environments
-    TEMPLATE_DIR = os.path.join(os.getcwd(), "kubernetes_templates")
-
-
 # --- Setup: Kubernetes API Connection ---
 try:
     # 1. Try to load config from *inside* the cluster
@@ -31,26 +29,191 @@ except config.ConfigException:
     except config.ConfigException:
         raise Exception("Could not configure Kubernetes client. Make sure you have a valid kubeconfig or are running in-cluster.")
 
-# 3. Create API client instances
+# 3. One ApiClient (and so one urllib3 connection pool) shared by every API group.
+# The default pool keeps only 4 connections, concurrent creates/deletes would keep
+# discarding and re-handshaking connections to the apiserver.
+k8s_config = client.Configuration.get_default_copy()
+k8s_config.connection_pool_maxsize = int(os.getenv("K8S_BURST", max(32, (os.cpu_count() or 4) * 5)))
+k8s_config.retries = int(os.getenv("K8S_RETRIES", 3))
+api_client = client.ApiClient(configuration=k8s_config)
+
+# 4. Create API client instances
 # We need AppsV1Api for Deployments
-apps_v1_api = client.AppsV1Api()
+apps_v1_api = client.AppsV1Api(api_client=api_client)
 # We need BatchV1Api for CronJobs
-batch_v1_api = client.BatchV1Api()
+batch_v1_api = client.BatchV1Api(api_client=api_client)
 # We need CoreV1Api for Services, ConfigMaps, etc.
-core_v1_api = client.CoreV1Api()
+core_v1_api = client.CoreV1Api(api_client=api_client)
 
 
-# --- Private Helper Function ---
-def _load_yaml_template(template_name: str) -> dict:
-    """Loads a YAML template from the kubernetes_templates directory."""
-    template_path = os.path.join(TEMPLATE_DIR, template_name)
-    if not os.path.exists(template_path):
-        print(f"Template directory searched: {TEMPLATE_DIR}")
-        raise FileNotFoundError(f"Template file not found: {template_path}")
-    
-    with open(template_path, 'r') as f:
-        # Use safe_load to avoid security risks
-        return yaml.safe_load(f)
+# Fans out the per-kind delete_collection calls; they share api_client's connection pool
+_delete_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="k8s-delete")
+
+
+# --- Private Helper Functions ---
+# Container settings of the per-camera resources
+DETECTION_IMAGE = os.getenv("DETECTION_IMAGE", "your-org/your-detection-image:latest")
+DETECTION_DATABASE_URL = os.getenv("DETECTION_DATABASE_URL", "mongodb://your-db-url")
+BATCH_SERVICE_IMAGE = os.getenv("BATCH_SERVICE_IMAGE", "your-org/your-batch-image:latest")
+BATCH_SCHEDULE = "*/1 * * * *" # Run every minute
+# CronJob names are DNS-1123 labels capped at 52 characters (the controller appends an 11 character job suffix)
+CRONJOB_NAME_MAX = 52
+SERVICE_CRONJOB_SUFFIX = "-aggregator"
+
+
+def _service_cronjob_name(service_name: str) -> str:
+    """
+    '<service_name>-aggregator', the name the service CronJobs have always had, with the
+    service name reduced to a DNS-1123 label: lowercase alphanumerics and '-', no leading
+    or trailing '-', short enough for the whole name to fit CRONJOB_NAME_MAX.
+    Names that were already valid come out unchanged.
+    """
+    label = re.sub(r"[^a-z0-9-]+", "-", service_name.lower()).strip("-")
+    label = label[:CRONJOB_NAME_MAX - len(SERVICE_CRONJOB_SUFFIX)].rstrip("-")
+    if not label:
+        raise ValueError(f"Service name {service_name!r} has no characters usable in a resource name")
+    return f"{label}{SERVICE_CRONJOB_SUFFIX}"
+
+
+def _build_deployment(camera_id: str, rtsp_url: str) -> client.V1Deployment:
+    """
+    Builds a camera's real-time detection Deployment as typed client models,
+    handed to the API as is (no YAML, no dict copy).
+    """
+    resource_name = f"camera-detection-{camera_id}"
+    # The selector has to match the pod's label (which is also how a Service finds it)
+    pod_labels = {"app": resource_name}
+
+    return client.V1Deployment(
+        api_version="apps/v1",
+        kind="Deployment",
+        metadata=client.V1ObjectMeta(
+            name=resource_name,
+            labels={"app": resource_name, "camera_id": camera_id}
+        ),
+        spec=client.V1DeploymentSpec(
+            replicas=1,
+            selector=client.V1LabelSelector(match_labels=pod_labels),
+            template=client.V1PodTemplateSpec(
+                metadata=client.V1ObjectMeta(labels=pod_labels),
+                spec=client.V1PodSpec(
+                    containers=[
+                        client.V1Container(
+                            name="detection-container",
+                            image=DETECTION_IMAGE,
+                            image_pull_policy="Always",
+                            env=[
+                                client.V1EnvVar(name="DATABASE_URL", value=DETECTION_DATABASE_URL),
+                                client.V1EnvVar(name="RTSP_URL", value=rtsp_url),
+                                client.V1EnvVar(name="CAMERA_ID", value=camera_id),
+                            ]
+                        )
+                    ]
+                )
+            )
+        )
+    )
+
+
+def _build_cronjob(camera_id: str, service_id: str) -> client.V1CronJob:
+    """
+    Builds the batch processing CronJob of a camera/service pair as typed client models.
+    """
+    resource_name = f"batch-service-{service_id}-cam-{camera_id}"
+
+    return client.V1CronJob(
+        api_version="batch/v1",
+        kind="CronJob",
+        metadata=client.V1ObjectMeta(
+            name=resource_name,
+            labels={"camera_id": camera_id, "service_id": service_id}
+        ),
+        spec=client.V1CronJobSpec(
+            schedule=BATCH_SCHEDULE,
+            successful_jobs_history_limit=1,
+            failed_jobs_history_limit=1,
+            job_template=client.V1JobTemplateSpec(
+                spec=client.V1JobSpec(
+                    backoff_limit=1,
+                    template=client.V1PodTemplateSpec(
+                        spec=client.V1PodSpec(
+                            restart_policy="OnFailure",
+                            containers=[
+                                client.V1Container(
+                                    name="batch-container",
+                                    image=BATCH_SERVICE_IMAGE,
+                                    # Camera/service IDs as environment variables (often cleaner than args)
+                                    env=[
+                                        client.V1EnvVar(name="CAMERA_ID", value=camera_id),
+                                        client.V1EnvVar(name="SERVICE_ID", value=service_id),
+                                        client.V1EnvVar(
+                                            name="MONGODB_URI",
+                                            value_from=client.V1EnvVarSource(
+                                                secret_key_ref=client.V1SecretKeySelector(
+                                                    name="sentinel-secrets",
+                                                    key="MONGODB_URI"
+                                                )
+                                            )
+                                        ),
+                                    ]
+                                )
+                            ]
+                        )
+                    )
+                )
+            )
+        )
+    )
+
+
+def _build_service_cronjob(service_name: str, image_name: str, service_id: str, schedule: str) -> client.V1CronJob:
+    """
+    Builds the CronJob of a subscribed service as typed client models.
+    """
+    resource_name = _service_cronjob_name(service_name)
+
+    return client.V1CronJob(
+        api_version="batch/v1",
+        kind="CronJob",
+        metadata=client.V1ObjectMeta(
+            name=resource_name,
+            labels={"service_id": service_id}
+        ),
+        spec=client.V1CronJobSpec(
+            schedule=schedule,
+            successful_jobs_history_limit=1,
+            failed_jobs_history_limit=1,
+            job_template=client.V1JobTemplateSpec(
+                spec=client.V1JobSpec(
+                    backoff_limit=1,
+                    template=client.V1PodTemplateSpec(
+                        spec=client.V1PodSpec(
+                            restart_policy="OnFailure",
+                            containers=[
+                                client.V1Container(
+                                    name=f"{resource_name}-container",
+                                    image=image_name,
+                                    env=[
+                                        client.V1EnvVar(name="SERVICE_ID", value=service_id),
+                                        client.V1EnvVar(
+                                            name="MONGODB_URI",
+                                            value_from=client.V1EnvVarSource(
+                                                secret_key_ref=client.V1SecretKeySelector(
+                                                    name="sentinel-secrets",
+                                                    key="MONGODB_URI"
+                                                )
+                                            )
+                                        ),
+                                    ]
+                                )
+                            ]
+                        )
+                    )
+                )
+            )
+        )
+    )
+
 
 # --- Public Functions (to be called by your API routes) ---
 
@@ -59,30 +222,10 @@ def create_camera_deployment(camera_id: str, rtsp_url: str, namespace: str = "de
     Creates a new Deployment for a camera's real-time detection pod.
     """
     print(f"Attempting to create deployment for camera: {camera_id}")
+    resource_name = f"camera-detection-{camera_id}"
     try:
-        # 1. Load the template from file
-        deployment_body = _load_yaml_template("detection_deployment.yaml")
-
-        # 2. Modify the template with camera-specific data
-        resource_name = f"camera-detection-{camera_id}"
-
-        # Set the main name and label for the Deployment
-        deployment_body["metadata"]["name"] = resource_name
-        deployment_body["metadata"]["labels"]["app"] = resource_name
-        deployment_body["metadata"]["labels"]["camera_id"] = camera_id
-
-        # Set the pod's label (so a Service can find it)
-        deployment_body["spec"]["template"]["metadata"]["labels"]["app"] = resource_name
-
-        # Find the container and set its environment variables
-        # This assumes the first container is the one we want to modify
-        container = deployment_body["spec"]["template"]["spec"]["containers"][0]
-        
-        # Add env vars to a new list or extend existing one
-        env_vars = container.get("env", [])
-        env_vars.append({"name": "RTSP_URL", "value": rtsp_url})
-        env_vars.append({"name": "CAMERA_ID", "value": camera_id})
-        container["env"] = env_vars
+        # 1. + 2. Build the Deployment with the camera-specific data
+        deployment_body = _build_deployment(camera_id, rtsp_url)
 
         # 3. Create the resource in Kubernetes
         api_response = apps_v1_api.create_namespaced_deployment(
@@ -106,25 +249,10 @@ def create_camera_cronjob(camera_id: str, service_id: str, namespace: str = "def
     Creates a new CronJob for a camera's batch processing service.
     """
     print(f"Attempting to create cronjob for camera: {camera_id}, service: {service_id}")
+    resource_name = f"batch-service-{service_id}-cam-{camera_id}"
     try:
-        # 1. Load the template
-        cronjob_body = _load_yaml_template("batch_cronjob.yaml")
-
-        # 2. Modify the template
-        resource_name = f"batch-service-{service_id}-cam-{camera_id}"
-        
-        cronjob_body["metadata"]["name"] = resource_name
-        cronjob_body["metadata"]["labels"]["camera_id"] = camera_id
-        cronjob_body["metadata"]["labels"]["service_id"] = service_id
-
-        # Get the container to modify
-        container = cronjob_body["spec"]["jobTemplate"]["spec"]["template"]["spec"]["containers"][0]
-        
-        # Add camera/service IDs as environment variables (often cleaner than args)
-        env_vars = container.get("env", [])
-        env_vars.append({"name": "CAMERA_ID", "value": camera_id})
-        env_vars.append({"name": "SERVICE_ID", "value": service_id})
-        container["env"] = env_vars
+        # 1. + 2. Build the CronJob with the camera/service-specific data
+        cronjob_body = _build_cronjob(camera_id, service_id)
 
         # 3. Create the resource
         api_response = batch_v1_api.create_namespaced_cron_job(
@@ -142,37 +270,75 @@ def create_camera_cronjob(camera_id: str, service_id: str, namespace: str = "def
         raise e
 
 
-def delete_camera_resources(camera_id: str, namespace: str = "default"):
+def create_cronjob(service_name: str, image_name: str, service_id: str, schedule: str = BATCH_SCHEDULE, namespace: str = "default"):
+    """
+    Creates the CronJob of a subscribed service.
+    Returns the created CronJob's name, or None if it couldn't be created.
+    """
+    print(f"Attempting to create cronjob for service: {service_name}")
+    try:
+        cronjob_body = _build_service_cronjob(service_name, image_name, service_id, schedule)
+        api_response = batch_v1_api.create_namespaced_cron_job(
+            body=cronjob_body,
+            namespace=namespace
+        )
+        print(f"CronJob '{api_response.metadata.name}' created successfully.")
+        return api_response.metadata.name
+
+    except ApiException as e:
+        print(f"K8s API Error creating cronjob for service {service_name}: {e.status} - {e.reason}")
+        return None
+    except ValueError as e:
+        print(f"Invalid service name for cronjob: {e}")
+        return None
+
+
+def delete_camera_resources(camera_id: str, namespace: str = "default") -> dict:
     """
     Deletes all resources (Deployments, CronJobs) associated with a camera_id.
     
-    This is a simplified version. A robust way uses 'label selectors'.
+    This uses label selectors to find all resources tagged with this camera_id.
+    The kinds are independent, so their deletes run in parallel. Failures are
+    collected per kind in the returned dict instead of being raised.
     """
     print(f"Attempting to delete all resources for camera: {camera_id}")
     
     # This uses a label selector to find all resources tagged with this camera_id
     label_selector = f"camera_id={camera_id}"
-    
-    try:
-        # Delete Deployments
-        apps_v1_api.delete_collection_namespaced_deployment(
+
+    futures = {
+        "Deployments": _delete_executor.submit(
+            apps_v1_api.delete_collection_namespaced_deployment,
             namespace=namespace,
             label_selector=label_selector
-        )
-        print(f"Deleted Deployments with label: {label_selector}")
-    except ApiException as e:
-        print(f"Error deleting deployments: {e}")
-
-    try:
-        # Delete CronJobs
-        batch_v1_api.delete_collection_namespaced_cron_job(
+        ),
+        "CronJobs": _delete_executor.submit(
+            batch_v1_api.delete_collection_namespaced_cron_job,
             namespace=namespace,
             label_selector=label_selector
-        )
-        print(f"Deleted CronJobs with label: {label_selector}")
-    except ApiException as e:
-        print(f"Error deleting cronjobs: {e}")
-        
-    # You would also delete Services, ConfigMaps, etc. here
-    
-    return True
\ No newline at end of file
+        ),
+        # You would also delete Services, ConfigMaps, etc. here
+    }
+
+    errors = {}
+    for kind, future in futures.items():
+        try:
+            future.result()
+            print(f"Deleted {kind} with label: {label_selector}")
+        except ApiException as e:
+            print(f"Error deleting {kind}: {e}")
+            errors[kind] = f"{e.status} - {e.reason}"
+
+    return {"camera_id": camera_id, "errors": errors}
+
+
+def delete_camera_deployment(name: str, namespace: str = "default"):
+    """Deletes one Deployment by name (e.g. to roll back a half-created camera)."""
+    apps_v1_api.delete_namespaced_deployment(name=name, namespace=namespace)
+    print(f"Deleted Deployment: {name}")
+
+
+def delete_camera_cronjob(name: str, namespace: str = "default"):
+    """Deletes one CronJob by name (e.g. to roll back a half-created camera)."""
+    batch_v1_api.delete_namespaced_cron_job(name=name, namespace=namespace)
+    print(f"Deleted CronJob: {name}")
@@ -1,7 +1,8 @@
 import mongoengine as db
-import datetime
 from .stores_schema import Stores
 from src.database.schemas.models_schema import Models
+from .utils import utcnow
+
 
 class Cameras(db.Document):
     deviceName = db.StringField(required=True)  
@@ -19,8 +20,8 @@ class Cameras(db.Document):
     ipAddress = db.StringField()
     fowardedAddress = db.StringField()
 
-    createdAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
-    updatedAt = db.DateTimeField(default=datetime.datetime.now(datetime.timezone.utc))
+    createdAt = db.DateTimeField(default=utcnow)
+    updatedAt = db.DateTimeField(default=utcnow)
     meta = {
         'collection': 'cameras'
     }
@@ -1,5 +1,6 @@
 import mongoengine as db 
-from datetime import datetime
+from .utils import utcnow
+
 
 class Models(db.Document):
     modelType = db.StringField(required=True)
@@ -11,8 +12,8 @@ class Models(db.Document):
     conf = db.FloatField(default=0.6)  
     inputDims =  db.ListField(db.IntField())
     store = db.ReferenceField("Stores")
-    createdAt = db.StringField(default=datetime.utcnow)
-    updatedAt = db.StringField(default=datetime.utcnow)
+    createdAt = db.DateTimeField(default=utcnow)
+    updatedAt = db.DateTimeField(default=utcnow)
     configYamlPath = db.StringField(requested=False, default="")
 
 
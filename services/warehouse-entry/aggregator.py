@@ -1,6 +1,7 @@
 import pika
 import json
 import sys
+import redis
 from pymongo import MongoClient
 
 # --- Constants ---
@@ -11,6 +12,46 @@ NEXUS_COLLECTION = "nexus_test"
 # RabbitMQ Constants
 RABBITMQ_HOST = "rabbitmq"  # Use the Kubernetes Service name
 EVIDENCE_QUEUE = "evidence_jobs" # The name of our "todo" list
+CONFIRM_BATCH = 100 # Jobs published per broker acknowledgement
+
+# Redis Constants
+REDIS_HOST = "redis"  # Use the Kubernetes Service name
+DEDUPE_TTL = 3600 # Seconds a published job blocks re-publishing the same nexus_id
+
+# Shared connection pool, one per process
+dedupe = redis.Redis(connection_pool=redis.ConnectionPool(host=REDIS_HOST))
+
+# Same properties for every job, built once
+PERSISTENT = pika.BasicProperties(
+    delivery_mode=pika.DeliveryMode.Persistent # Make message persistent
+)
+
+
+def first_publish(nexus_id):
+    """
+    Dedupe gate: True only the first time nexus_id is published within DEDUPE_TTL.
+    Fails open (True) when Redis is unreachable; the atomic claim still prevents most duplicates.
+    """
+    try:
+        return bool(dedupe.set(f"ev:queued:{nexus_id}", "1", nx=True, ex=DEDUPE_TTL))
+    except redis.RedisError as e:
+        print(f"⚠️ [Aggregator] Dedupe check failed for {nexus_id}: {e}")
+        return True
+
+
+def forget_publish(nexus_ids):
+    """
+    Opens the gate again for jobs that were never delivered, so the next run can publish them.
+    Returns False if the keys could not be cleared.
+    """
+    if not nexus_ids:
+        return True
+    try:
+        dedupe.delete(*(f"ev:queued:{nexus_id}" for nexus_id in nexus_ids))
+        return True
+    except redis.RedisError as e:
+        print(f"⚠️ [Aggregator] Could not clear dedupe keys: {e}")
+        return False
 
 
 def get_pipeline(start_day, end_day, device_id):
@@ -34,41 +75,108 @@ def get_pipeline(start_day, end_day, device_id):
     ]
     return pipeline
 
-def publish_job_to_queue(nexus_id):
+class JobPublisher:
     """
-    Sends a new job to the evidence creator queue.
+    Sends jobs to the evidence creator queue over one connection.
+    Use as a context manager so the connection is opened once per run, not once per job.
+
+    Publishes are acknowledged by the broker in batches of CONFIRM_BATCH: the channel is
+    transactional and every commit is one round trip for the whole batch (BlockingChannel
+    has no asynchronous confirms to wait on in bulk). Only ids in committed batches end
+    up in confirmed_ids; the rest are handed back to the next run by release().
     """
-    connection = None
-    try:
+
+    def __init__(self, claims):
+        # Collection holding the evidenceQueued claims of the published jobs
+        self.claims = claims
+        self.connection = None
+        self.channel = None
+        self.pending_ids = []
+        self.confirmed_ids = []
+
+    def __enter__(self):
         # 1. Connect to RabbitMQ
-        connection = pika.BlockingConnection(
+        self.connection = pika.BlockingConnection(
             pika.ConnectionParameters(host=RABBITMQ_HOST)
         )
-        channel = connection.channel()
+        self.channel = self.connection.channel()
 
         # 2. Declare the queue (this is idempotent, safe to run)
         #    durable=True means the queue will survive a RabbitMQ restart
-        channel.queue_declare(queue=EVIDENCE_QUEUE, durable=True)
+        self.channel.queue_declare(queue=EVIDENCE_QUEUE, durable=True)
+        self.channel.tx_select()
+        return self
+
+    def publish(self, nexus_id):
+        """
+        Publishes one job; the broker acknowledges it with the rest of its batch.
+        Jobs already published recently (e.g. re-claimed after a partial failure) are skipped.
+        """
+        if not first_publish(nexus_id):
+            print(f"ℹ️ [Aggregator] Job already queued, skipping: {nexus_id}")
+            return
+
+        # In flight from here on: if the publish below raises, the id is released
+        # (dedupe key and claim) together with the rest of the unacknowledged batch
+        self.pending_ids.append(nexus_id)
 
         # 3. Create the message body
         message_body = json.dumps({"nexus_id": str(nexus_id)})
 
         # 4. Publish the message
-        channel.basic_publish(
+        self.channel.basic_publish(
             exchange='',              # Default exchange
             routing_key=EVIDENCE_QUEUE, # The name of the queue
             body=message_body,
-            properties=pika.BasicProperties(
-                delivery_mode=pika.DeliveryMode.Persistent # Make message persistent
-            )
+            properties=PERSISTENT
         )
-        print(f"✅ [Aggregator] Sent job to queue: {nexus_id}")
+        if len(self.pending_ids) >= CONFIRM_BATCH:
+            self.commit()
 
-    except Exception as e:
-        print(f"❌ [Aggregator] Failed to publish job: {e}")
-    finally:
-        if connection:
-            connection.close()
+    def commit(self):
+        """
+        Waits for the broker to accept every job published since the last commit.
+        """
+        if not self.pending_ids:
+            return
+        self.channel.tx_commit()
+        self.confirmed_ids.extend(self.pending_ids)
+        print(f"✅ [Aggregator] Sent {len(self.pending_ids)} jobs to queue")
+        self.pending_ids = []
+
+    def release(self):
+        """
+        Hands the unacknowledged jobs back to the next run. The dedupe keys go first: a
+        released claim whose key is still set would be re-claimed, skipped as already
+        queued and never published. If the keys can't be cleared the claims are kept.
+        """
+        if not self.pending_ids:
+            return
+        nexus_ids, self.pending_ids = self.pending_ids, []
+        if not forget_publish(nexus_ids):
+            print(f"🚨 [Aggregator] {len(nexus_ids)} jobs left claimed but unpublished: {nexus_ids}")
+            return
+        self.claims.update_many(
+            {"_id": {"$in": nexus_ids}},
+            {"$unset": {"evidenceQueued": ""}}
+        )
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                try:
+                    self.commit()
+                except Exception as e:
+                    print(f"❌ [Aggregator] Failed to commit {len(self.pending_ids)} jobs: {e}")
+                    self.release()
+                    raise
+            elif self.pending_ids:
+                print(f"❌ [Aggregator] Failed to publish {len(self.pending_ids)} jobs: {exc}")
+                self.release()
+        finally:
+            if self.connection and self.connection.is_open:
+                self.connection.close()
+        return False
 
 def run_aggregation():
     # 1. Connect to MongoDB
@@ -92,32 +200,35 @@ def run_aggregation():
     # then publish, then merge.
     
     # A SIMPLER way: Run your $merge as planned.
-    # Then, run a *second* query to find unprocessed jobs.
-    
-    # Find all entries from today that haven't been queued yet
-    unprocessed_jobs = db[NEXUS_COLLECTION].find({
-        "evidenceQueued": {"$exists": False} 
-    })
-    
-    ids_to_queue = []
-    for job in unprocessed_jobs:
-        ids_to_queue.append(job["_id"])
+    # Then claim the unprocessed jobs one at a time.
 
-    if not ids_to_queue:
+    # 2. Atomically claim an entry that hasn't been queued yet and publish it.
+    #    find_one_and_update marks it in the same step, so two overlapping runs
+    #    can never publish the same job twice and nothing is scanned a second time.
+    nexus_collection = db[NEXUS_COLLECTION]
+    # Lets the claim below seek the unqueued entries instead of scanning the collection
+    # (idempotent). Not a partial index: partial filters can't express {$exists: False},
+    # but missing fields are indexed as null so a regular index serves the query.
+    nexus_collection.create_index("evidenceQueued")
+    # 3. On any failure the publisher releases the jobs the broker never acknowledged
+    #    (dedupe keys and claims) so the next run retries them
+    publisher = JobPublisher(nexus_collection)
+    with publisher:
+        while True:
+            job = nexus_collection.find_one_and_update(
+                {"evidenceQueued": {"$exists": False}},
+                {"$set": {"evidenceQueued": True}},
+                projection={"_id": 1}
+            )
+            if job is None:
+                break
+            publisher.publish(job["_id"])
+
+    if not publisher.confirmed_ids:
         print("ℹ️ [Aggregator] No new jobs to queue.")
         return
 
-    print(f"Found {len(ids_to_queue)} new jobs to queue...")
-
-    for job_id in ids_to_queue:
-        # 2. Publish a job for each new entry
-        publish_job_to_queue(job_id)
-        
-        # 3. Mark the job as "queued" in the DB
-        db[NEXUS_COLLECTION].update_one(
-            {"_id": job_id},
-            {"$set": {"evidenceQueued": True}}
-        )
+    print(f"Queued {len(publisher.confirmed_ids)} new jobs.")
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -3,6 +3,13 @@ import json
 import sys
 import os
 import time
+import functools
+import subprocess
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import redis
 from pymongo import MongoClient
 from bson.objectid import ObjectId
 
@@ -12,47 +19,231 @@ NEXUS_COLLECTION = "nexus_test"
 METADATA_COLLECTION = "metadata"
 RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
 EVIDENCE_QUEUE = "evidence_jobs"
+EVIDENCE_DIR = os.environ.get("EVIDENCE_DIR", "evidence") # Where finished videos are written
+EVIDENCE_FPS = float(os.environ.get("EVIDENCE_FPS", 5)) # Playback rate of the evidence frames
+
+# Dedupe gate so a redelivered job doesn't run ffmpeg again
+REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
+DEDUPE_TTL = 3600 # Seconds a finished job blocks another run of the same nexus_id
+RUNNING_TTL = 900 # Seconds a job counts as running; outlives a crashed worker only this long
+BUSY_RETRY_DELAY = 5 # Seconds before a job that is running elsewhere goes back to the queue
+
+# Job outcomes, decide whether the message is acked or requeued
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_BUSY = "busy"
+
+# Long ffmpeg jobs must not cost us the connection: heartbeats keep flowing while a job runs
+HEARTBEAT = 600 # Seconds
+BLOCKED_CONNECTION_TIMEOUT = 300 # Seconds
+
+# Concurrent ffmpeg jobs per worker pod, and so also the number of unacked messages we take.
+# Every ffmpeg encode is multi-threaded itself, so a quarter of the CPUs keeps them busy.
+MAX_JOBS = int(os.environ.get("EVIDENCE_MAX_JOBS", max(1, (os.cpu_count() or 1) // 4)))
+
+# Created in main(); jobs run in separate processes so the pika I/O thread is never blocked
+job_executor = None
+# Probed once in main() and handed to every job process (see _init_job_process)
+job_encoder = None
+
+
+SOFTWARE_ENCODER = ([], ["-c:v", "libx264", "-preset", "veryfast"])
+NVENC_ENCODER = (["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"], ["-c:v", "h264_nvenc", "-preset", "p4"])
+
+
+def _probe_encoder():
+    """
+    Picks the ffmpeg input/output args for encoding evidence videos:
+    NVENC (decode on the GPU as well) when a test encode on this node works, libx264 otherwise.
+    Listing h264_nvenc in -encoders is not enough, distro builds have it without a GPU/libcuda.
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "nullsrc=s=256x256", "-frames:v", "1",
+             "-c:v", "h264_nvenc", "-f", "null", "-"],
+            capture_output=True, timeout=30
+        )
+        if result.returncode == 0:
+            return NVENC_ENCODER
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"⚠️ [Worker] Could not probe ffmpeg encoders: {e}")
+    return SOFTWARE_ENCODER
+
+
+# ffmpeg args placed before the input / before the output, set in each job process by _init_job_process
+HWACCEL_ARGS, ENCODER_ARGS = SOFTWARE_ENCODER
+
+
+def run_ffmpeg(input_args, output_path):
+    """
+    Encodes the given ffmpeg input into an H.264 mp4 with the probed encoder,
+    retrying with libx264 when the hardware encode fails.
+    """
+    def encode(hwaccel_args, encoder_args):
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+             *hwaccel_args, *input_args, *encoder_args, output_path],
+            check=True
+        )
+
+    if ENCODER_ARGS == SOFTWARE_ENCODER[1]:
+        encode(*SOFTWARE_ENCODER)
+        return
+    try:
+        encode(HWACCEL_ARGS, ENCODER_ARGS)
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ [Worker] Hardware encode failed ({e}), retrying with libx264.")
+        encode(*SOFTWARE_ENCODER)
+
+
+def write_concat_list(list_path, frame_paths):
+    """
+    Writes an ffmpeg concat demuxer list: one 'file' line per frame, each shown for 1/EVIDENCE_FPS.
+    """
+    frame_duration = 1 / EVIDENCE_FPS
+    with open(list_path, "w") as f:
+        for frame_path in frame_paths:
+            if "://" not in frame_path:
+                frame_path = os.path.abspath(frame_path)
+            escaped = frame_path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\nduration {frame_duration}\n")
+
 
 # --- MongoDB Connection ---
-# Create a persistent client
-client = MongoClient("mongodb://...")
-db = client[DB_NAME]
-nexus_collection = db[NEXUS_COLLECTION]
-metadata_collection = db[METADATA_COLLECTION]
+# Persistent client, opened per job process by _init_job_process
+client = None
+nexus_collection = None
+metadata_collection = None
+
+# --- Redis Connection ---
+# Shared connection pool, one per process (job processes and the consumer, see _connect_redis)
+dedupe = None
+
+
+def _connect_redis():
+    global dedupe
+    if dedupe is None:
+        dedupe = redis.Redis(connection_pool=redis.ConnectionPool(host=REDIS_HOST))
+
+
+def _init_job_process(encoder):
+    """
+    Pool initializer, runs once in every job process. With 'spawn' each process
+    re-imports this module, so nothing expensive happens at import: the encoder is
+    probed once in main() and passed in, and the clients are opened here.
+    """
+    global HWACCEL_ARGS, ENCODER_ARGS, client, nexus_collection, metadata_collection
+    HWACCEL_ARGS, ENCODER_ARGS = encoder
+    client = MongoClient("mongodb://...")
+    db = client[DB_NAME]
+    nexus_collection = db[NEXUS_COLLECTION]
+    metadata_collection = db[METADATA_COLLECTION]
+    _connect_redis()
+
+
+def claim_run(nexus_id):
+    """
+    Dedupe gate before running a job. Returns JOB_DONE when the evidence was already
+    produced, JOB_BUSY when another worker is running it right now, else None and the
+    job is marked running. Fails open (None) when Redis is unreachable.
+    """
+    try:
+        if dedupe.exists(f"ev:done:{nexus_id}"):
+            return JOB_DONE
+        if not dedupe.set(f"ev:running:{nexus_id}", "1", nx=True, ex=RUNNING_TTL):
+            return JOB_BUSY
+    except redis.RedisError as e:
+        print(f"⚠️ [Worker] Dedupe check failed for {nexus_id}: {e}")
+    return None
+
+
+def finish_run(nexus_id, success):
+    """
+    Clears the running mark; only a successful job leaves a 'done' marker behind,
+    anything else may run again.
+    """
+    try:
+        pipe = dedupe.pipeline()
+        if success:
+            pipe.set(f"ev:done:{nexus_id}", "1", ex=DEDUPE_TTL)
+        pipe.delete(f"ev:running:{nexus_id}")
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"⚠️ [Worker] Could not update dedupe keys for {nexus_id}: {e}")
 
 
 def create_video_evidence(nexus_id):
     """
     This is where your ffmpeg logic from Script 2 goes.
+    Returns JOB_DONE, JOB_FAILED or JOB_BUSY (running elsewhere, try again later).
     """
+    claimed = claim_run(nexus_id)
+    if claimed == JOB_DONE:
+        print(f"ℹ️ [Worker] Evidence for {nexus_id} already exists, skipping.")
+        return JOB_DONE
+    if claimed == JOB_BUSY:
+        print(f"ℹ️ [Worker] Job {nexus_id} is running elsewhere, requeueing.")
+        # Returned right away: the consumer delays the requeue, this job slot is free for the next message
+        return JOB_BUSY
+
     print(f"🎬 [Worker] Starting evidence creation for: {nexus_id}")
+    success = False
     try:
         # 1. Get the KPI record from Nexus DB
         evidence_doc = nexus_collection.find_one({"_id": ObjectId(nexus_id)})
         if not evidence_doc:
             print(f"❌ [Worker] Error: No document found for {nexus_id}")
-            return False
+            return JOB_FAILED
 
         # --- (Your entire 'evidence_pipeline' logic from script 2 goes here) ---
-        # 2. Find all frames from 'metadata'
-        # 3. Copy frames locally to a temp dir
-        # 4. Run ffmpeg
-        # 5. ...
-        
-        # Simulating work
-        time.sleep(5) 
-        
-        # 6. Update the Nexus DB with the path
+        # 2. Find all frames from 'metadata' in one query, oldest first.
+        #    Served by the (device_name, -time_stamp) index; only the path is fetched.
+        frames = list(
+            metadata_collection.find(
+                {
+                    "device_name": evidence_doc["device"],
+                    "time_stamp": {"$gte": evidence_doc["startTime"], "$lte": evidence_doc["endTime"]},
+                    # Empty when the camera doesn't save raw frames (saveRawFrame is off by default)
+                    "raw_frame_path": {"$nin": ["", None]}
+                },
+                projection={"raw_frame_path": 1, "_id": 0}
+            ).sort("time_stamp", 1).batch_size(1000)
+        )
+        if not frames:
+            print(f"❌ [Worker] Error: No frames found for {nexus_id}")
+            return JOB_FAILED
+
         output_filename = f"evidence_{nexus_id}.mp4"
+        output_path = os.path.join(EVIDENCE_DIR, output_filename)
+        os.makedirs(EVIDENCE_DIR, exist_ok=True)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            # 3. No local copy: the concat list points ffmpeg at the frames where they are
+            #    (absolute paths, or URLs such as presigned links for remote stores),
+            #    so the temp dir only holds the list itself
+            concat_path = os.path.join(work_dir, "concat.txt")
+            write_concat_list(concat_path, [frame["raw_frame_path"] for frame in frames])
+
+            # 4. Run ffmpeg (run_ffmpeg, NVENC when available) over the concat list
+            run_ffmpeg(
+                ["-f", "concat", "-safe", "0",
+                 "-protocol_whitelist", "file,http,https,tcp,tls,crypto",
+                 "-i", concat_path],
+                output_path
+            )
+
+        # 5. Update the Nexus DB with the path
         nexus_collection.update_one(
             {"_id": ObjectId(nexus_id)},
             {"$set": {
-                "evidencePath": output_filename,
+                "evidencePath": output_path,
                 "processingStatus": "complete"
             }}
         )
         print(f"✅ [Worker] Successfully created evidence: {output_filename}")
-        return True
+        success = True
+        return JOB_DONE
 
     except Exception as e:
         print(f"❌ [Worker] FAILED to create evidence for {nexus_id}: {e}")
@@ -61,53 +252,134 @@ def create_video_evidence(nexus_id):
             {"_id": ObjectId(nexus_id)},
             {"$set": {"processingStatus": "failed", "error": str(e)}}
         )
-        return False
+        return JOB_FAILED
+
+    finally:
+        finish_run(nexus_id, success)
+
+
+def _new_executor():
+    # 'spawn' so every job process opens its own MongoClient instead of inheriting a forked one
+    return ProcessPoolExecutor(
+        max_workers=MAX_JOBS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_job_process,
+        initargs=(job_encoder,)
+    )
+
+
+def _submit(nexus_id):
+    """
+    Submits a job, replacing the pool first if a job process died (segfault, OOM kill):
+    a broken pool refuses every later job.
+    """
+    global job_executor
+    try:
+        return job_executor.submit(create_video_evidence, nexus_id)
+    except BrokenProcessPool:
+        print("🚨 [Worker] A job process died, restarting the process pool.")
+        job_executor.shutdown(wait=False, cancel_futures=True)
+        job_executor = _new_executor()
+        return job_executor.submit(create_video_evidence, nexus_id)
+
+
+def _job_done(ch, delivery_tag, redelivered, nexus_id, future):
+    """
+    Runs in the executor's result thread once a job finished: hands the ack back to
+    the connection thread, pika channels must not be used from any other thread.
+    """
+    try:
+        outcome = future.result()
+    except BrokenProcessPool as e:
+        # The process died mid-job (this one or a neighbour), so it never cleared its running mark
+        print(f"🚨 [Worker] Job {nexus_id} lost with its process: {e}")
+        finish_run(nexus_id, False)
+        # Retry once; a job that keeps killing its process is dropped below
+        outcome = JOB_FAILED if redelivered else JOB_BUSY
+    except Exception as e:
+        print(f"🚨 [Worker] Job {nexus_id} crashed: {e}")
+        outcome = JOB_FAILED
+
+    if outcome == JOB_DONE:
+        print(f"👍 [Worker] Job {nexus_id} complete.")
+        # Tell RabbitMQ the job is done and can be removed
+        reply = functools.partial(ch.basic_ack, delivery_tag=delivery_tag)
+    elif outcome == JOB_BUSY:
+        # Running elsewhere (or lost with its process): back to the queue, whoever gets it next checks again.
+        # Not straight back, it would bounce between workers until that run ends; the timer runs on the
+        # connection thread, no job process waits for it.
+        nack = functools.partial(ch.basic_nack, delivery_tag=delivery_tag, requeue=True)
+        reply = functools.partial(ch.connection.call_later, BUSY_RETRY_DELAY, nack)
+    else:
+        print(f"👎 [Worker] Job {nexus_id} failed. Will not retry.")
+        # A failed job is 'acknowledged' too to remove it
+        # (Or you could 'nack' it to send it to a dead-letter queue)
+        reply = functools.partial(ch.basic_ack, delivery_tag=delivery_tag)
+
+    try:
+        ch.connection.add_callback_threadsafe(reply)
+    except Exception as e:
+        # Connection went away meanwhile: RabbitMQ redelivers the unacked message
+        print(f"⚠️ [Worker] Could not reply for job {nexus_id}: {e}")
 
 
 def on_message_callback(ch, method, properties, body):
     """
     This function is called by pika every time a message is received.
+    It only dispatches the job; the ack follows when the job process is done.
     """
     try:
         # 1. Parse the message
         data = json.loads(body)
         nexus_id = data.get("nexus_id")
-        
-        if not nexus_id:
-            print("❌ [Worker] Received empty message. Discarding.")
-            # Acknowledge the message so it's removed from the queue
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            return
-
-        print(f"▶️ [Worker] Received job, ID: {nexus_id}")
-        
-        # 2. Do the heavy work (ffmpeg)
-        success = create_video_evidence(nexus_id)
-
-        # 3. Acknowledge the message
-        if success:
-            print(f"👍 [Worker] Job {nexus_id} complete.")
-            # Tell RabbitMQ the job is done and can be removed
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-        else:
-            print(f"👎 [Worker] Job {nexus_id} failed. Will not retry.")
-            # 'Acknowledge' a failed job to remove it
-            # (Or you could 'nack' it to send it to a dead-letter queue)
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
     except Exception as e:
-        print(f"🚨 [Worker] Error in callback: {e}")
-        # Acknowledge anyway to prevent crash-loop
+        print(f"🚨 [Worker] Unreadable message: {e}. Discarding.")
+        # Acknowledge anyway: redelivering it would fail the same way
         ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    if not nexus_id:
+        print("❌ [Worker] Received empty message. Discarding.")
+        # Acknowledge the message so it's removed from the queue
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    print(f"▶️ [Worker] Received job, ID: {nexus_id}")
+
+    try:
+        # 2. Do the heavy work (ffmpeg) in the process pool
+        future = _submit(nexus_id)
+    except Exception as e:
+        # Our problem, not the message's: give it back for this or another worker
+        print(f"🚨 [Worker] Could not start job {nexus_id}: {e}. Requeueing.")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        return
+
+    # 3. Acknowledge the message once the job finished
+    future.add_done_callback(
+        functools.partial(_job_done, ch, method.delivery_tag, method.redelivered, nexus_id)
+    )
+
 
 def main():
+    global job_executor, job_encoder
     print("🚀 [Worker] Starting evidence-creator worker...")
+    job_encoder = _probe_encoder()
+    print(f"[Worker] Encoding with {job_encoder[1][1]}, up to {MAX_JOBS} jobs at a time.")
+    # The consumer clears running marks of jobs lost with their process (_job_done)
+    _connect_redis()
+    job_executor = _new_executor()
     print(f"Connecting to RabbitMQ at {RABBITMQ_HOST}...")
 
+    connection = None
     while True:
         try:
             connection = pika.BlockingConnection(
-                pika.ConnectionParameters(host=RABBITMQ_HOST)
+                pika.ConnectionParameters(
+                    host=RABBITMQ_HOST,
+                    heartbeat=HEARTBEAT,
+                    blocked_connection_timeout=BLOCKED_CONNECTION_TIMEOUT
+                )
             )
             channel = connection.channel()
 
@@ -115,10 +387,10 @@ def main():
             channel.queue_declare(queue=EVIDENCE_QUEUE, durable=True)
 
             # Set Quality of Service (QoS)
-            # This tells RabbitMQ to only send 1 message at a time to this worker.
-            # Don't send a new job until this worker has 'acked' the current one.
+            # This tells RabbitMQ to only send MAX_JOBS messages at a time to this worker,
+            # one per job process. Don't send more until this worker has 'acked' one.
             # This is CRITICAL for a slow, CPU-bound task like ffmpeg.
-            channel.basic_qos(prefetch_count=1)
+            channel.basic_qos(prefetch_count=MAX_JOBS)
 
             # 4. Tell the channel to use our callback function
             channel.basic_consume(
@@ -136,8 +408,9 @@ def main():
             time.sleep(5)
         except KeyboardInterrupt:
             print("🛑 [Worker] Shutting down...")
-            if connection:
+            if connection and connection.is_open:
                 connection.close()
+            job_executor.shutdown(wait=False, cancel_futures=True)
             break
         except Exception as e:
             print(f"🚨 [Worker] Unhandled error: {e}. Restarting...")